@@ -0,0 +1,68 @@
+from limits import parse
+
+from config import app, limiter
+
+
+class LoginAttemptTracker:
+    """
+    Counts failed logins per account and per IP address in the rate
+    limiter's storage, so the counts are shared by every worker and
+    decay over the limit's sliding window. Unlike the session cookie,
+    they can't be reset by the client.
+    """
+
+    def __init__(self, limiter, account_limit, ip_limit):
+        self.limiter = limiter
+        self.account_limit = parse(account_limit)
+        self.ip_limit = parse(ip_limit)
+
+    def _counters(self, email, ip):
+        return (
+            (self.account_limit, "login-account", (email or "").lower()),
+            (self.ip_limit, "login-ip", ip or ""),
+        )
+
+    def is_locked(self, email, ip):
+        """
+        Returns True when the account or the IP address has no attempts left.
+        Only reads the counters, so it is cheap enough to run before
+        looking the user up or checking the password.
+        """
+        return any(
+            not self.limiter.limiter.test(limit, *identifiers)
+            for limit, *identifiers in self._counters(email, ip)
+        )
+
+    def record_failure(self, email, ip):
+        """
+        Counts a failed attempt and returns how many attempts are left.
+        """
+        for limit, *identifiers in self._counters(email, ip):
+            self.limiter.limiter.hit(limit, *identifiers)
+        return self.remaining(email, ip)
+
+    def remaining(self, email, ip):
+        return min(
+            self.limiter.limiter.get_window_stats(limit, *identifiers).remaining
+            for limit, *identifiers in self._counters(email, ip)
+        )
+
+    def failures(self, email):
+        """
+        Returns the number of failed attempts counted against the account.
+        """
+        limit, *identifiers = self._counters(email, None)[0]
+        stats = self.limiter.limiter.get_window_stats(limit, *identifiers)
+        return limit.amount - stats.remaining
+
+    def reset(self, email):
+        # a successful login clears the account's count, the IP keeps its own
+        limit, *identifiers = self._counters(email, None)[0]
+        self.limiter.limiter.clear(limit, *identifiers)
+
+
+login_attempts = LoginAttemptTracker(
+    limiter,
+    account_limit=app.config["LOGIN_ACCOUNT_LIMIT"],
+    ip_limit=app.config["LOGIN_IP_LIMIT"],
+)
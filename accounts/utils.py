@@ -1,22 +1,26 @@
-from flask import flash, redirect, request, session, url_for
+from flask import flash, redirect, request, url_for
 from flask_login import login_user
-from markupsafe import Markup
 
-from config import User, db, logger
+import events
+from accounts.attempts import login_attempts
+from config import User, db, ph, record_event
 from utils import redirect_based_on_role
 
 
-def login_and_redirect(user: User):
+def login_and_redirect(user: User, password=None):
     """
-    Logs in the user and sets the session attempts to 0.
+    Logs in the user and clears the account's failed attempts.
     And then, redirects the user based on their role.
     """
     # got email, password and mfa right = login successful
     logged = login_user(user)
+    # the log update is committed along with any other change made by the login
     user.update_log()
-    logger.info(
-        f"[User: {user.email}, Role: {user.role}, IP: {request.remote_addr}] Successful Login."
-    )
+    # upgrade hashes made with other argon2 parameters
+    if password is not None and ph.check_needs_rehash(user.password):
+        user.rehash_password(password)
+    db.session.commit()
+    record_event(events.LOGIN, user=user)
 
     if logged is False:
         flash(
@@ -24,36 +28,50 @@ def login_and_redirect(user: User):
             category="danger",
         )
         return redirect(url_for("accounts.login"))
-    session["attempts"] = 0
+    login_attempts.reset(user.email)
     flash("Login Successful.", category="success")
     return redirect_based_on_role()
 
 
-def authentication_attempts_limiter(session, form, user):
+def lock_out(form, user=None):
     """
-    Limit the number of authentication attempts.
-    Returns the login form if the number of attempts
-    is less than 3 and None if the number of attempts
-    is greater than or equal to 3.
+    Tells the user to try again later and hides the login form.
     """
-    if session["attempts"] >= 3:
-        flash(
-            Markup(
-                "Number of incorrect login attempts exceeded. Please click <a href='/unlock'>here</a> to unlock your account."
-            ),
-            category="danger",
-        )
-        logger.info(
-            f"[User: {form.email.data}, Attempts: {session['attempts']}, IP: {request.remote_addr}] Exceeded Login Attempts."
-        )
-        # TODO: user may not log in using credentials from an inactive account
-        # user.active = False
-        # db.session.commit()
+    flash(
+        "Number of incorrect login attempts exceeded. Please try again later.",
+        category="danger",
+    )
+    record_event(
+        events.LOGIN_LOCKED,
+        user=user,
+        email=form.email.data,
+        attempts=login_attempts.failures(form.email.data),
+    )
+    # TODO: user may not log in using credentials from an inactive account
+    # user.active = False
+    # db.session.commit()
+
+    # hide login form
+    return None
+
 
-        # hide login form
-        return None
+def authentication_attempts_limiter(form, user):
+    """
+    Counts a failed authentication attempt against the account and the IP.
+    Returns the login form while attempts are left and None
+    once they have run out.
+    """
+    remaining = login_attempts.record_failure(form.email.data, request.remote_addr)
+    record_event(
+        events.LOGIN_FAILED,
+        user=user,
+        email=form.email.data,
+        attempts=login_attempts.failures(form.email.data),
+    )
+    if remaining <= 0:
+        return lock_out(form, user)
     flash(
-        f"Please check your login credentials and try again. You have {3 - session['attempts']} attempts left.",
+        f"Please check your login credentials and try again. You have {remaining} attempts left.",
         category="danger",
     )
     return form
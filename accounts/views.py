@@ -1,10 +1,37 @@
-from flask import Blueprint, flash, redirect, render_template, request, session, url_for
+from flask import (
+    Blueprint,
+    current_app,
+    flash,
+    get_flashed_messages,
+    make_response,
+    redirect,
+    render_template,
+    request,
+    stream_template,
+    url_for,
+)
 from flask_login import current_user, login_required, logout_user
+from sqlalchemy.orm import joinedload
 
+import events
 from accounts.forms import LoginForm, RegistrationForm
-from accounts.utils import authentication_attempts_limiter, login_and_redirect
-from config import Post, User, db, limiter, logger, ph
-from decorators import anonymous_required
+from accounts.attempts import login_attempts
+from accounts.utils import (
+    authentication_attempts_limiter,
+    lock_out,
+    login_and_redirect,
+)
+from config import (
+    Post,
+    User,
+    db,
+    limiter,
+    password_pool,
+    record_event,
+)
+from decorators import anonymous_required, read_only
+from posts.utils import iter_post_cards, post_cards
+from utils import keyset_paginate, not_modified, page_validators, with_validators
 
 accounts_bp = Blueprint("accounts", __name__, template_folder="templates")
 
@@ -19,7 +46,7 @@ def registration():
             flash("Email already exists.", category="danger")
             return render_template("accounts/registration.html", form=form)
 
-        password_hash = ph.hash(form.password.data)
+        password_hash = password_pool.hash(form.password.data)
         new_user = User(
             email=form.email.data,
             firstname=form.firstname.data,
@@ -28,13 +55,12 @@ def registration():
             password=password_hash,
         )
 
+        # the user and their log are saved in one transaction
         db.session.add(new_user)
+        new_user.generate_log()
         db.session.commit()
 
-        new_user.generate_log()
-        logger.info(
-            f"[User: {new_user.email}, Role: {new_user.role}, IP: {request.remote_addr}] Successful Registration."
-        )
+        record_event(events.REGISTRATION, user=new_user)
 
         flash(
             "Account Created. You must enable Multi-Factor Authentication (MFA) to login.",
@@ -49,20 +75,19 @@ def registration():
     return render_template("accounts/registration.html", form=form)
 
 
-# when reloading the page the form reappears but the session is not reset
 @accounts_bp.route("/login", methods=["GET", "POST"])
 @limiter.limit("20 per minute")
 @anonymous_required
 def login():
-    # check if authentication attempts is in session
-    if "attempts" not in session:
-        session["attempts"] = 0
-
     # creates an instance of the LoginForm class
     form = LoginForm()
 
     # if the login form instance is validated
     if form.validate_on_submit():
+        # reject locked out accounts and IPs before the lookup and password hashing
+        if login_attempts.is_locked(form.email.data, request.remote_addr):
+            return render_template("accounts/login.html", form=lock_out(form))
+
         user = User.query.filter_by(email=form.email.data).first()
 
         # check if email and password are valid
@@ -72,11 +97,11 @@ def login():
             if user.validate_mfa(form.mfa_key.data):
 
                 # check if MFA is enabled when getting the key right
+                # (committed with the rest of the login)
                 if user.mfa_enabled is False:
                     user.mfa_enabled = True
-                    db.session.commit()
 
-                return login_and_redirect(user)
+                return login_and_redirect(user, form.password.data)
 
             # check if MFA is not enabled when getting the key wrong
             elif user.mfa_enabled is False:
@@ -90,12 +115,8 @@ def login():
                     uri=user.get_uri_mfa(),
                 )
 
-        # got something wrong - increase attempts
-        session["attempts"] += 1
-        logger.info(
-            f"[User: {form.email.data}, Attempts: {session["attempts"]}, IP: {request.remote_addr}] Invalid Login Attempt."
-        )
-        form = authentication_attempts_limiter(session=session, form=form, user=user)
+        # got something wrong - count the failed attempt
+        form = authentication_attempts_limiter(form=form, user=user)
 
     # form was not valid or the number of attempts was exceeded
     return render_template("accounts/login.html", form=form)
@@ -103,19 +124,53 @@ def login():
 
 @accounts_bp.route("/account")
 @login_required
+@read_only
 def account():
-    posts: list[Post] = current_user.posts
-    for post in posts:
-        post.title, post.body = post.decrypt_post()
-
-    return render_template("accounts/account.html", posts=posts)
+    own_posts = Post.query.filter_by(userid=current_user.id)
+    etag, last_modified = page_validators(own_posts, Post.id, Post.created)
+    unchanged = not_modified(etag, last_modified)
+    if unchanged:
+        return unchanged
+
+    posts, newer, older = keyset_paginate(
+        own_posts.options(joinedload(Post.user)),
+        Post.id,
+        per_page=current_app.config["POSTS_PER_PAGE"],
+        before=request.args.get("before", type=int),
+        after=request.args.get("after", type=int),
+    )
+    # taken out of the session before a streamed response saves it
+    messages = get_flashed_messages(with_categories=True)
+    if current_app.config["STREAM_FEEDS"]:
+        return with_validators(
+            make_response(
+                stream_template(
+                    "accounts/account.html",
+                    messages=messages,
+                    cards=iter_post_cards(posts, current_user.get_id()),
+                    newer=newer,
+                    older=older,
+                )
+            ),
+            etag,
+            last_modified,
+        )
 
+    cards = post_cards(posts, current_user.get_id())
 
-@accounts_bp.route("/unlock")
-@anonymous_required
-def unlock():
-    session["attempts"] = 0
-    return redirect(url_for("accounts.login"))
+    return with_validators(
+        make_response(
+            render_template(
+                "accounts/account.html",
+                messages=messages,
+                cards=cards,
+                newer=newer,
+                older=older,
+            )
+        ),
+        etag,
+        last_modified,
+    )
 
 
 @accounts_bp.route("/mfa_setup")
@@ -127,9 +182,8 @@ def mfa_setup():
 @accounts_bp.route("/logout")
 @login_required
 def logout():
-    email = current_user.email
-    role = current_user.role
+    user = current_user._get_current_object()
     logout_user()
 
-    logger.info(f"[User: {email}, Role: {role}] Successful Log Out.")
-    return redirect(url_for("index"))
+    record_event(events.LOGOUT, user=user)
+    return redirect(url_for("main.index"))
@@ -0,0 +1,98 @@
+from typing import override
+
+from flask import abort, flash, g, redirect, url_for
+from flask_admin import Admin
+from flask_admin.contrib.sqla import ModelView
+from flask_admin.menu import MenuLink
+from flask_login import current_user
+from sqlalchemy.orm import selectinload
+
+from config import Post, User, db
+
+
+class MainIndexLink(MenuLink):
+    def get_url(self):
+        return url_for("main.index")
+
+
+class PostView(ModelView):
+    column_display_pk = True
+    column_hide_backrefs = False
+    column_list = ("id", "userid", "created", "title", "body", "user")
+
+    can_create = False
+    can_edit = False
+    can_delete = False
+
+    @override
+    def is_accessible(self):
+        return current_user.is_authenticated and current_user.role == "db_admin"
+
+    @override
+    def inaccessible_callback(self, name, **kwargs):  # type: ignore
+        if current_user.is_authenticated:
+            abort(403)
+        # if anonymous
+        flash("Administrator access required.", category="danger")
+        return redirect(url_for("accounts.login"))
+
+    @override
+    def _handle_view(self, name, **kwargs):
+        # access is checked on the primary, then the list page reads from a replica
+        response = super()._handle_view(name, **kwargs)
+        if name == "index_view":
+            g.read_only = True
+        return response
+
+
+class UserView(ModelView):
+    column_display_pk = True  # optional, but I like to see the IDs in the list
+    column_hide_backrefs = False
+    column_list = (
+        "id",
+        "email",
+        "password",
+        "mfa_key",
+        "mfa_enabled",
+        "firstname",
+        "lastname",
+        "phone",
+        "posts",
+    )
+
+    @override
+    def get_query(self):
+        # load every listed user's posts in one extra query instead of one per user
+        return super().get_query().options(selectinload(User.posts))
+
+    @override
+    def is_accessible(self):
+        return current_user.is_authenticated and current_user.role == "db_admin"
+
+    @override
+    def inaccessible_callback(self, name, **kwargs):  # type: ignore
+        if current_user.is_authenticated:
+            abort(403)
+        # if anonymous
+        flash("Administrator access required.", category="danger")
+        return redirect(url_for("accounts.login"))
+
+    @override
+    def _handle_view(self, name, **kwargs):
+        # access is checked on the primary, then the list page reads from a replica
+        response = super()._handle_view(name, **kwargs)
+        if name == "index_view":
+            g.read_only = True
+        return response
+
+
+def init_admin(app):
+    """
+    Sets up the database admin pages on the app.
+    """
+    admin = Admin(app, name="DB Admin", template_mode="bootstrap4")
+    admin._menu = admin._menu[1:]
+    admin.add_link(MainIndexLink(name="Home Page"))
+    admin.add_view(PostView(Post, db.session))
+    admin.add_view(UserView(User, db.session))
+    return admin
@@ -1,61 +1,93 @@
-from flask import render_template, request
-from flask_login import current_user
-
-from config import app, conditions, logger
-
-
-@app.route("/")
-def index():
-    return render_template("home/index.html")
-
-
-@app.errorhandler(429)
-def rate_limit(e):
-    logger.info(
-        f"[User: {current_user.email}, Role: {current_user.role}, URL Requested: {request.url}, IP: {request.remote_addr}] Rate Limit."
-    )
-    return render_template("errors/rate_limit.html"), 429
-
-
-@app.errorhandler(403)
-def forbidden(e):
-    logger.info(
-        f"[User: {current_user.email}, Role: {current_user.role}, URL Requested: {request.url}, IP: {request.remote_addr}] Forbidden Access."
-    )
-    return render_template("errors/forbidden.html"), 403
-
-
-# bad request
-@app.errorhandler(400)
-def bad_request(e):
-    return render_template("errors/bad_request.html"), 400
-
-
-# not found
-@app.errorhandler(404)
-def page_not_found(e):
-    return render_template("errors/not_found.html"), 404
-
-
-# internal server error
-@app.errorhandler(500)
-def internal_server_error(e):
-    return render_template("errors/internal_server_error.html"), 500
-
-
-# not implemented
-@app.errorhandler(501)
-def not_implemented(e):
-    return render_template("errors/not_implemented.html"), 501
-
-
-@app.before_request
-def firewall():
-    for type, pattern in conditions.items():
-        if pattern.search(request.path) or pattern.search(
-            request.query_string.decode()
-        ):
-            return render_template("errors/attack_detected.html", label=type)
+import os
+
+import click
+from flask import current_app
+from sqlalchemy import event
+
+import config
+from database import sqlite_pragmas
+from template_cache import warm_templates
+
+# flask commands that serve or inspect the web app, and so need every page
+SERVING_COMMANDS = ("run", "routes", "shell")
+
+
+def flask_command():
+    """
+    Returns the name of the `flask` command loading the app,
+    or None when it is loaded by a WSGI server or imported.
+    """
+    if os.environ.get("FLASK_RUN_FROM_CLI") != "true":
+        return None
+    context = click.get_current_context(silent=True)
+    return context.command.name if context else None
+
+
+def qrcode(*args, **kwargs):
+    # flask_qrcode and the imaging libraries are imported on the first mfa setup page
+    from flask_qrcode import QRcode
+
+    return QRcode.qrcode(*args, static_dir=current_app.static_folder, **kwargs)
+
+
+def setup_app():
+    """
+    Finishes setting up the app built in config.py for this process:
+    creates the database engines with their sqlite pragmas, sets up
+    Talisman and the rate limiter, registers the blueprints and the
+    extensions this process needs. Flask-Admin is only set up when the
+    app serves pages (and ADMIN_ENABLED is set), Migrate and the cli
+    commands only for `flask` commands, and QRcode is imported the first
+    time a code is drawn. The app, models and extensions are module
+    globals of config.py, so it only runs once and returns that app.
+    """
+    app = config.app
+    if "main" in app.blueprints:
+        return app
+
+    # process level set up: database engines, response headers,
+    # rate limits and their storage
+    with app.app_context():
+        # the pragmas are applied to every new connection
+        for engine in config.db.engines.values():
+            event.listen(engine, "connect", sqlite_pragmas(app.config))
+    config.talisman.init_app(app, content_security_policy=config.csp)
+    config.limiter.init_app(app)
+
+    # imported here, the blueprints import config
+    from accounts.views import accounts_bp
+    from main.views import main_bp
+    from posts.views import posts_bp
+    from security.views import security_bp
+
+    app.register_blueprint(main_bp)
+    app.register_blueprint(accounts_bp)
+    app.register_blueprint(posts_bp)
+    app.register_blueprint(security_bp)
+    app.add_template_global(qrcode, "qrcode")
+
+    command = flask_command()
+    if command is None or command in SERVING_COMMANDS:
+        if app.config["ADMIN_ENABLED"]:
+            from admin import init_admin
+
+            init_admin(app)
+        if app.config["TEMPLATE_WARMUP"]:
+            timings = warm_templates(app)
+            app.extensions["template_warmup"] = {
+                "templates": len(timings),
+                "ms": sum(timings.values()),
+            }
+    if command is not None:
+        from flask_migrate import Migrate
+
+        Migrate(app, config.db)
+        import commands  # registers the flask cli commands
+
+    return app
+
+
+app = setup_app()
 
 
 if __name__ == "__main__":
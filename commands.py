@@ -0,0 +1,305 @@
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import timeit
+from datetime import datetime
+
+import click
+from argon2 import PasswordHasher
+from sqlalchemy import create_engine, event, insert, select
+from limits import parse
+from limits.storage import storage_from_string
+from limits.strategies import STRATEGIES
+
+from database import engine_options, sqlite_pragmas
+from template_cache import warm_templates
+
+from config import Post, app, conditions, db, firewall_matcher
+
+
+def legacy_firewall_match(path, query_string):
+    # the original before_request loop, kept for comparison
+    for type, pattern in conditions.items():
+        if pattern.search(path) or pattern.search(query_string):
+            return type
+    return None
+
+
+@app.cli.command("bench-firewall")
+@click.option("--number", default=10000, help="Requests matched per input.")
+def bench_firewall(number):
+    """
+    Compares the single-pass firewall matcher with the per-rule loop,
+    then times the request body scan of each body rule family.
+    """
+    inputs = {
+        "home page": ("/", ""),
+        "posts page": ("/posts", "before=120"),
+        "static file": ("/static/css/bootstrap.min.css", "v=5.2.2"),
+        "sql injection": ("/posts", "id=1 UNION SELECT password FROM users"),
+        "xss": ("/posts", "q=%3Cscript%3Ealert(1)"),
+        "long clean query": ("/posts", "q=" + "abcdefgh" * 512),
+        "near misses": ("/" + "sel/uni/." * 256, "x=" + "<scrip%2e" * 256),
+    }
+
+    click.echo(
+        f"{'input':<20}{'loop (us)':>12}{'single pass (us)':>20}{'cached (us)':>14}"
+    )
+    for name, (path, query_string) in inputs.items():
+        if legacy_firewall_match(path, query_string) != firewall_matcher.match(
+            path, query_string
+        ):
+            click.echo(f"{name}: matchers disagree on the label")
+        loop = timeit.timeit(
+            lambda: legacy_firewall_match(path, query_string), number=number
+        )
+        single = timeit.timeit(
+            lambda: firewall_matcher.match(path, query_string), number=number
+        )
+        raw_query_string = query_string.encode()
+        cached = timeit.timeit(
+            lambda: firewall_matcher.check(path, raw_query_string), number=number
+        )
+        click.echo(
+            f"{name:<20}{loop / number * 1e6:>12.2f}"
+            f"{single / number * 1e6:>20.2f}{cached / number * 1e6:>14.2f}"
+        )
+    click.echo(f"verdict cache: {firewall_matcher.verdicts.stats()}")
+
+    # a 1 MB post body in 64 KB chunks, scanned with the body rule families
+    body = "title=hello&body=" + "lorem ipsum <b>dolor</b> " * 42000
+    chunks = [body[start : start + 65536] for start in range(0, len(body), 65536)]
+    for _ in range(max(1, number // 1000)):
+        firewall_matcher.scan_chunks(
+            chunks,
+            labels=app.config["FIREWALL_BODY_RULES"],
+            overlap=app.config["FIREWALL_BODY_OVERLAP"],
+        )
+    click.echo(f"{'body rule family':<20}{'scans':>12}{'per chunk (us)':>20}")
+    for label, stats in firewall_matcher.body_stats().items():
+        click.echo(f"{label:<20}{stats['scans']:>12}{stats['mean_us']:>20.2f}")
+
+
+@app.cli.command("bench-limiter")
+@click.option("--number", default=10000, help="Rate limit checks per storage.")
+def bench_limiter(number):
+    """
+    Measures the per-check overhead of the rate limiter storages.
+    """
+    strategy = STRATEGIES[app.config["RATELIMIT_STRATEGY"]]
+    item = parse("500 per day")
+    with tempfile.TemporaryDirectory() as directory:
+        storages = {
+            "memory://": storage_from_string("memory://"),
+            "sqlite:///": storage_from_string(
+                f"sqlite:///{os.path.join(directory, 'ratelimit.db')}"
+            ),
+        }
+        for name, storage in storages.items():
+            limiter = strategy(storage)
+            # spread the checks over many keys, like requests from many IPs
+            elapsed = timeit.timeit(
+                lambda: limiter.hit(item, str(os.urandom(2).hex())), number=number
+            )
+            click.echo(f"{name:<12}{elapsed / number * 1e6:>10.2f} us per check")
+
+
+def _verify_ms(time_cost, memory_cost, parallelism, rounds):
+    hasher = PasswordHasher(
+        time_cost=time_cost, memory_cost=memory_cost, parallelism=parallelism
+    )
+    password_hash = hasher.hash("calibration password")
+    timings = []
+    for _ in range(rounds):
+        start = time.perf_counter()
+        hasher.verify(password_hash, "calibration password")
+        timings.append(time.perf_counter() - start)
+    return statistics.median(timings) * 1000
+
+
+@app.cli.command("calibrate-argon2")
+@click.option("--target-ms", default=250.0, help="Verify latency to stay under.")
+@click.option("--max-memory", default=262144, help="Memory cost ceiling in KiB.")
+@click.option("--parallelism", default=None, type=int, help="Lanes (threads).")
+@click.option("--rounds", default=5, help="Verifies timed per candidate.")
+def calibrate_argon2(target_ms, max_memory, parallelism, rounds):
+    """
+    Finds argon2 parameters whose verify time on this host meets the target.
+    Memory is halved from the ceiling until one pass fits the target,
+    then passes are added while the verify time stays under it.
+    """
+    parallelism = parallelism or app.config["ARGON2_PARALLELISM"]
+    current = _verify_ms(
+        app.config["ARGON2_TIME_COST"],
+        app.config["ARGON2_MEMORY_COST"],
+        app.config["ARGON2_PARALLELISM"],
+        rounds,
+    )
+    click.echo(f"current parameters: {current:.1f} ms per verify")
+    click.echo(f"{'time cost':>10}{'memory (KiB)':>14}{'verify (ms)':>14}")
+
+    def measure(time_cost, memory_cost):
+        elapsed = _verify_ms(time_cost, memory_cost, parallelism, rounds)
+        click.echo(f"{time_cost:>10}{memory_cost:>14}{elapsed:>14.1f}")
+        return elapsed
+
+    memory_cost = max_memory
+    while measure(1, memory_cost) > target_ms and memory_cost // 2 >= 8 * parallelism:
+        memory_cost //= 2
+    time_cost = 1
+    while measure(time_cost + 1, memory_cost) <= target_ms:
+        time_cost += 1
+
+    click.echo(f"ARGON2_TIME_COST={time_cost}")
+    click.echo(f"ARGON2_MEMORY_COST={memory_cost}")
+    click.echo(f"ARGON2_PARALLELISM={parallelism}")
+
+
+def _db_throughput(engine, readers, writers, seconds):
+    posts = Post.__table__
+    statements = {
+        "reads": select(posts).order_by(posts.c.id.desc()).limit(20),
+        "writes": insert(posts).values(created=datetime.now(), title="t", body="b"),
+    }
+    counts = {"reads": 0, "writes": 0, "errors": 0}
+    lock = threading.Lock()
+    deadline = time.perf_counter() + seconds
+
+    def work(kind):
+        done = errors = 0
+        while time.perf_counter() < deadline:
+            try:
+                with engine.begin() as connection:
+                    result = connection.execute(statements[kind])
+                    if result.returns_rows:
+                        result.all()
+                done += 1
+            except Exception:
+                errors += 1
+        with lock:
+            counts[kind] += done
+            counts["errors"] += errors
+
+    threads = [threading.Thread(target=work, args=("reads",)) for _ in range(readers)]
+    threads += [threading.Thread(target=work, args=("writes",)) for _ in range(writers)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return counts
+
+
+@app.cli.command("bench-db")
+@click.option("--readers", default=8, help="Threads reading the feed query.")
+@click.option("--writers", default=2, help="Threads inserting posts.")
+@click.option("--seconds", default=3.0, help="Duration of each run.")
+def bench_db(readers, writers, seconds):
+    """
+    Compares read/write throughput on a scratch sqlite file with the
+    default rollback journal and with the configured engine profile.
+    """
+    profiles = {
+        "default": (
+            {},
+            dict(app.config, SQLITE_JOURNAL_MODE="DELETE", SQLITE_SYNCHRONOUS="FULL"),
+        ),
+        "tuned": (None, app.config),
+    }
+    click.echo(f"{'profile':<10}{'reads/s':>12}{'writes/s':>12}{'errors':>8}")
+    for name, (options, config) in profiles.items():
+        with tempfile.TemporaryDirectory() as directory:
+            uri = f"sqlite:///{os.path.join(directory, 'bench.db')}"
+            if options is None:
+                options = engine_options(uri, config)
+            engine = create_engine(uri, **options)
+            event.listen(engine, "connect", sqlite_pragmas(config))
+            db.metadata.create_all(engine, tables=[Post.__table__])
+            counts = _db_throughput(engine, readers, writers, seconds)
+            engine.dispose()
+        click.echo(
+            f"{name:<10}{counts['reads'] / seconds:>12.0f}"
+            f"{counts['writes'] / seconds:>12.0f}{counts['errors']:>8}"
+        )
+
+
+# started in a fresh interpreter, the way a WSGI server loads the app
+STARTUP_SCRIPT = """
+import time
+start = time.perf_counter()
+import app
+print(f"startup_ms={(time.perf_counter() - start) * 1000:.1f}")
+warmup = app.app.extensions.get("template_warmup", {"templates": 0, "ms": 0})
+print(f"template_ms={warmup['ms']:.1f} templates={warmup['templates']}")
+"""
+
+
+def _cold_start(env):
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", STARTUP_SCRIPT],
+        cwd=app.root_path,
+        env=env,
+        capture_output=True,
+        text=True,
+    )
+    if result.returncode:
+        raise click.ClickException(result.stderr.strip().splitlines()[-1])
+    stats = dict(field.split("=") for field in result.stdout.split())
+    return result.stderr, {key: float(value) for key, value in stats.items()}
+
+
+@app.cli.command("startup-report")
+@click.option("--top", default=15, help="Slowest top level imports to list.")
+@click.option("--max-ms", default=None, type=float, help="Fail above this time.")
+def startup_report(top, max_ms):
+    """
+    Times a cold start of the web app with -X importtime and lists
+    the slowest imports and the template compile time, then again with
+    the templates in the bytecode cache. --max-ms makes it exit with an
+    error when the cold start is slower, to catch startup regressions.
+    """
+    env = dict(os.environ)
+    env.pop("FLASK_RUN_FROM_CLI", None)
+    env["TEMPLATE_WARMUP"] = "1"
+    with tempfile.TemporaryDirectory() as directory:
+        # first start compiles the templates, the second loads their bytecode
+        env["TEMPLATE_CACHE_DIR"] = directory
+        importtime, cold = _cold_start(env)
+        _, warm = _cold_start(env)
+
+    imports = []
+    for line in importtime.splitlines():
+        if not line.startswith("import time:") or "|" not in line[13:]:
+            continue
+        _, cumulative, name = line[12:].split("|")
+        # nested imports are indented, keep the ones made by the app's modules
+        if cumulative.strip().isdigit() and len(name) - len(name.lstrip()) <= 3:
+            imports.append((int(cumulative) / 1000, name.strip()))
+    startup_ms = cold["startup_ms"]
+
+    click.echo(f"{'module':<40}{'cumulative (ms)':>16}")
+    for elapsed, name in sorted(imports, reverse=True)[:top]:
+        click.echo(f"{name:<40}{elapsed:>16.1f}")
+    click.echo(
+        f"templates: {cold['templates']:.0f} compiled in {cold['template_ms']:.1f} ms,"
+        f" {warm['template_ms']:.1f} ms from the bytecode cache"
+    )
+    click.echo(f"startup: {startup_ms:.1f} ms cold, {warm['startup_ms']:.1f} ms warm")
+    if max_ms is not None and startup_ms > max_ms:
+        raise click.ClickException(
+            f"startup took {startup_ms:.1f} ms, over {max_ms} ms"
+        )
+
+
+@app.cli.command("warm-templates")
+def warm_templates_command():
+    """
+    Compiles every template into the bytecode cache, e.g. at build time.
+    """
+    timings = warm_templates(app)
+    for name, elapsed in sorted(timings.items()):
+        click.echo(f"{name:<40}{elapsed:>10.1f} ms")
+    click.echo(f"{len(timings)} templates in {sum(timings.values()):.1f} ms")
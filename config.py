@@ -1,26 +1,40 @@
+import atexit
 import base64
 import logging
 import os
+import queue
 import re
 import secrets
+import threading
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
 from hashlib import scrypt
-from typing import override
+from typing import NamedTuple
 
 import pyotp
-from argon2 import PasswordHasher, exceptions
+from argon2 import (
+    DEFAULT_MEMORY_COST,
+    DEFAULT_PARALLELISM,
+    DEFAULT_TIME_COST,
+    PasswordHasher,
+    exceptions,
+)
 from cryptography.fernet import Fernet, InvalidToken
 from dotenv import load_dotenv
-from flask import Flask, abort, flash, redirect, request, url_for
-from flask_admin import Admin
-from flask_admin.contrib.sqla import ModelView
-from flask_admin.menu import MenuLink
-from flask_login import LoginManager, UserMixin, current_user
-from flask_migrate import Migrate
-from flask_qrcode import QRcode
+from flask import Flask, has_request_context, request
+from flask_login import LoginManager, UserMixin
 from flask_sqlalchemy import SQLAlchemy
 from flask_talisman import Talisman
-from sqlalchemy import MetaData
+from sqlalchemy import MetaData, bindparam, event, select, update
+
+from cache import TTLCache
+from database import RoutingSession, engine_options
+from events import EventStoreHandler, format_event
+from firewall import Firewall, load_conditions
+from log_queue import BatchingQueueListener, BoundedQueueHandler
+from password_pool import PasswordPool, PasswordPoolBusy
+from rollups import SecurityRollups
+from template_cache import bytecode_cache
 
 load_dotenv()
 app = Flask(__name__)
@@ -41,7 +55,8 @@ csp = {
         "https://recaptcha.google.com/recaptcha/",
     ],
 }
-talisman = Talisman(app, content_security_policy=csp)
+# set up on the app by setup_app()
+talisman = Talisman()
 
 
 # env variables
@@ -51,6 +66,35 @@ app.config["SECRET_KEY"] = os.getenv("SECRET_KEY")
 # database configuration
 app.config["SQLALCHEMY_DATABASE_URI"] = os.getenv("SQLALCHEMY_DATABASE_URI")
 
+# connection pool, not used for in-memory sqlite databases
+app.config["DB_POOL_SIZE"] = int(os.getenv("DB_POOL_SIZE", 10))
+app.config["DB_MAX_OVERFLOW"] = int(os.getenv("DB_MAX_OVERFLOW", 20))
+app.config["DB_POOL_RECYCLE"] = int(os.getenv("DB_POOL_RECYCLE", 3600))
+app.config["DB_POOL_PRE_PING"] = bool(os.getenv("DB_POOL_PRE_PING"))
+
+# sqlite connection pragmas, WAL lets readers carry on while a write is committed
+app.config["SQLITE_JOURNAL_MODE"] = os.getenv("SQLITE_JOURNAL_MODE", "WAL")
+app.config["SQLITE_SYNCHRONOUS"] = os.getenv("SQLITE_SYNCHRONOUS", "NORMAL")
+app.config["SQLITE_MMAP_SIZE"] = int(os.getenv("SQLITE_MMAP_SIZE", 256 * 1024 * 1024))
+# negative sizes are in KiB
+app.config["SQLITE_CACHE_SIZE"] = int(os.getenv("SQLITE_CACHE_SIZE", -64000))
+app.config["SQLITE_BUSY_TIMEOUT"] = int(os.getenv("SQLITE_BUSY_TIMEOUT", 5000))
+
+app.config["SQLALCHEMY_ENGINE_OPTIONS"] = engine_options(
+    app.config["SQLALCHEMY_DATABASE_URI"], app.config
+)
+
+# read replicas, comma separated database uris. Queries of read-only views go
+# to a replica, except within REPLICA_READ_AFTER_WRITE seconds of a client's write
+app.config["SQLALCHEMY_BINDS"] = {
+    f"replica{i}": {"url": uri, **engine_options(uri, app.config)}
+    for i, uri in enumerate(
+        uri for uri in os.getenv("SQLALCHEMY_REPLICA_URIS", "").split(",") if uri
+    )
+}
+app.config["REPLICA_BIND_KEYS"] = list(app.config["SQLALCHEMY_BINDS"])
+app.config["REPLICA_READ_AFTER_WRITE"] = float(os.getenv("REPLICA_READ_AFTER_WRITE", 5))
+
 app.config["SQLALCHEMY_ECHO"] = bool(os.getenv("SQLALCHEMY_ECHO"))
 app.config["SQLALCHEMY_TRACK_MODIFICATIONS"] = bool(
     os.getenv("SQLALCHEMY_TRACK_MODIFICATIONS")
@@ -63,6 +107,74 @@ app.config["RECAPTCHA_PRIVATE_KEY"] = os.getenv("RECAPTCHA_PRIVATE_KEY")
 # flask admin configuration
 app.config["FLASK_ADMIN_FLUID_LAYOUT"] = bool(os.getenv("FLASK_ADMIN_FLUID_LAYOUT"))
 
+# serving processes set up Flask-Admin unless ADMIN_ENABLED=0, e.g. for
+# autoscaled web workers when the admin pages are served by other workers
+app.config["ADMIN_ENABLED"] = bool(int(os.getenv("ADMIN_ENABLED", 1)))
+
+# compiled templates are kept in TEMPLATE_CACHE_DIR (a private temp folder by
+# default) and serving processes compile them all at start when TEMPLATE_WARMUP is set
+app.config["TEMPLATE_CACHE_DIR"] = os.getenv("TEMPLATE_CACHE_DIR")
+app.config["TEMPLATE_WARMUP"] = bool(int(os.getenv("TEMPLATE_WARMUP", 1)))
+app.jinja_env.bytecode_cache = bytecode_cache(app.config["TEMPLATE_CACHE_DIR"])
+
+# security log file and the number of its lines shown per page on the dashboard
+app.config["SECURITY_LOG_FILE"] = os.getenv("SECURITY_LOG_FILE", "security.log")
+app.config["SECURITY_LOG_LINES"] = int(os.getenv("SECURITY_LOG_LINES", 10))
+
+# queued security logging: queue size, what to do when it is full
+# (drop, drop_oldest or block), and how records are batched to disk
+app.config["LOG_QUEUE_SIZE"] = int(os.getenv("LOG_QUEUE_SIZE", 10000))
+app.config["LOG_QUEUE_OVERFLOW"] = os.getenv("LOG_QUEUE_OVERFLOW", "drop")
+app.config["LOG_BATCH_SIZE"] = int(os.getenv("LOG_BATCH_SIZE", 100))
+app.config["LOG_FLUSH_INTERVAL"] = float(os.getenv("LOG_FLUSH_INTERVAL", 0.5))
+
+# hours kept by the security dashboard rollups
+app.config["ROLLUP_HOURS"] = int(os.getenv("ROLLUP_HOURS", 24))
+
+# queue last login/IP updates and write them in batches off the login request
+app.config["LOGIN_WRITE_BEHIND"] = bool(os.getenv("LOGIN_WRITE_BEHIND"))
+
+# rate limiter storage, sqlite:///<file> is shared by every worker on the host
+app.config["RATELIMIT_STORAGE_URI"] = os.getenv(
+    "RATELIMIT_STORAGE_URI", "sqlite:///ratelimit.db"
+)
+app.config["RATELIMIT_STRATEGY"] = os.getenv(
+    "RATELIMIT_STRATEGY", "sliding-window-counter"
+)
+
+# failed logins allowed per account and per IP address, kept in the limiter storage
+app.config["LOGIN_ACCOUNT_LIMIT"] = os.getenv("LOGIN_ACCOUNT_LIMIT", "3 per 15 minutes")
+app.config["LOGIN_IP_LIMIT"] = os.getenv("LOGIN_IP_LIMIT", "20 per 15 minutes")
+
+# number of rows per page of the security dashboard login table
+app.config["LOGS_PER_PAGE"] = int(os.getenv("LOGS_PER_PAGE", 20))
+
+# number of posts shown per page on the feed and account pages
+app.config["POSTS_PER_PAGE"] = int(os.getenv("POSTS_PER_PAGE", 20))
+
+# post encryption key cache configuration
+app.config["KEY_CACHE_SIZE"] = int(os.getenv("KEY_CACHE_SIZE", 256))
+app.config["KEY_CACHE_TTL"] = int(os.getenv("KEY_CACHE_TTL", 300))
+
+# send the feed and account pages as a stream, one post card at a time
+app.config["STREAM_FEEDS"] = bool(os.getenv("STREAM_FEEDS"))
+
+# cache of logged in users, so most requests don't have to load the user row
+app.config["USER_CACHE_SIZE"] = int(os.getenv("USER_CACHE_SIZE", 1024))
+app.config["USER_CACHE_TTL"] = int(os.getenv("USER_CACHE_TTL", 30))
+
+# rendered post card cache, capped by entry count and by bytes
+app.config["FRAGMENT_CACHE_SIZE"] = int(os.getenv("FRAGMENT_CACHE_SIZE", 2048))
+app.config["FRAGMENT_CACHE_BYTES"] = int(
+    os.getenv("FRAGMENT_CACHE_BYTES", 16 * 1024 * 1024)
+)
+
+# batch post decryption configuration
+app.config["DECRYPT_POOL_SIZE"] = int(os.getenv("DECRYPT_POOL_SIZE", 4))
+app.config["DECRYPT_PARALLEL_THRESHOLD"] = int(
+    os.getenv("DECRYPT_PARALLEL_THRESHOLD", 16)
+)
+
 
 metadata = MetaData(
     naming_convention={
@@ -74,8 +186,8 @@ metadata = MetaData(
     }
 )
 
-db = SQLAlchemy(app, metadata=metadata)
-migrate = Migrate(app, db)
+# its engines, and their sqlite pragmas, are set up by setup_app()
+db = SQLAlchemy(app, metadata=metadata, session_options={"class_": RoutingSession})
 
 # set up login configuration
 login_manager = LoginManager()
@@ -87,16 +199,76 @@ login_manager.init_app(app)
 
 @login_manager.user_loader
 def load_user(id: int):
-    return User.query.get(int(id))
+    snapshot = user_cache.get(int(id))
+    if snapshot is None:
+        user = db.session.get(User, int(id))
+        if user is None:
+            return None
+        snapshot = UserSnapshot(
+            *(getattr(user, field) for field in UserSnapshot._fields)
+        )
+        user_cache.set(user.id, snapshot)
+    return CurrentUser(snapshot)
+
+
+# logged in users, keyed by user id
+user_cache = TTLCache(
+    maxsize=app.config["USER_CACHE_SIZE"], ttl=app.config["USER_CACHE_TTL"]
+)
+
+
+# rendered post cards, keyed by (post id, author id, created, viewer is author).
+# Cards hold decrypted posts, so they are kept encrypted under a key that
+# only lives in this process
+fragment_cache = TTLCache(
+    maxsize=app.config["FRAGMENT_CACHE_SIZE"],
+    maxbytes=app.config["FRAGMENT_CACHE_BYTES"],
+)
+fragment_cipher = Fernet(Fernet.generate_key())
+
+
+# derived post keys, keyed by (user id, salt, password hash)
+key_cache = TTLCache(
+    maxsize=app.config["KEY_CACHE_SIZE"], ttl=app.config["KEY_CACHE_TTL"]
+)
+
+
+def derive_key(user) -> bytes:
+    """
+    Returns the Fernet key used to encrypt the user's posts.
+    The scrypt derivation only runs again when the user's
+    password or salt change, or when the cached key expires.
+    """
+    return _derive_key(user.id, user.salt, user.password)
+
+
+def _derive_key(user_id, salt, password) -> bytes:
+    cache_key = (user_id, salt, password)
+    key = key_cache.get(cache_key)
+    if key is None:
+        key = base64.b64encode(
+            scrypt(
+                password=password.encode(),
+                salt=salt.encode(),
+                n=2048,
+                r=8,
+                p=1,
+                dklen=32,
+            )
+        )
+        key_cache.set(cache_key, key)
+    return key
 
 
 # database tables
 class Post(db.Model):
     __tablename__ = "posts"
+    # cover the newest post / post count aggregates of the feed and account pages
+    __table_args__ = (db.Index("ix_posts_userid_created", "userid", "created"),)
 
     id = db.Column(db.Integer, primary_key=True)
     userid = db.Column(db.Integer, db.ForeignKey("users.id"))
-    created = db.Column(db.DateTime, nullable=False)
+    created = db.Column(db.DateTime, nullable=False, index=True)
     title = db.Column(db.Text, nullable=False)
     body = db.Column(db.Text, nullable=False)
     user = db.relationship("User", back_populates="posts")
@@ -111,40 +283,38 @@ class Post(db.Model):
         self.created = datetime.now()
         self.title = title
         self.body = body
-        self.encrypt_post(self.user)
+        self.commit_encrypted(self.user)
+        fragment_cache.invalidate_where(lambda key: key[0] == self.id)
+
+    def commit_encrypted(self, user):
+        """
+        Encrypts the post with the author's key and commits it. The post is
+        written before the author's password hash is read again under a
+        lock, so if a login rehashed the password in the meantime the post
+        is encrypted again with the new key instead of the old one.
+        """
+        title, body = self.title, self.body
+        password = user.password
+        self.encrypt_post(user)
+        db.session.add(self)
+        db.session.flush()
+        author = db.session.execute(
+            select(User)
+            .where(User.id == self.userid)
+            .with_for_update(read=True)
+            .execution_options(populate_existing=True)
+        ).scalar_one()
+        if author.password != password:
+            self.title, self.body = title, body
+            self.encrypt_post(author)
         db.session.commit()
 
     def decrypt_post(self) -> tuple[str, str]:
         # regenerating the same key as encryption
-        key = scrypt(
-            password=self.user.password.encode(),
-            salt=self.user.salt.encode(),
-            n=2048,
-            r=8,
-            p=1,
-            dklen=32,
-        )
-        try:
-            cipher = Fernet(base64.b64encode(key))
-            return (
-                cipher.decrypt(self.title).decode(),
-                cipher.decrypt(self.body).decode(),
-            )
-        except InvalidToken:
-            error = "Error: not using the same key as encryption"
-            return error, error
+        return _decrypt_contents(Fernet(derive_key(self.user)), self.title, self.body)
 
     def encrypt_post(self, user):
-        key = scrypt(
-            password=user.password.encode(),
-            salt=user.salt.encode(),
-            n=2048,
-            r=8,
-            p=1,
-            dklen=32,
-        )
-        encoded_key = base64.b64encode(key)
-        cipher = Fernet(encoded_key)
+        cipher = Fernet(derive_key(user))
 
         encrypted_title: str = cipher.encrypt(self.title.encode()).decode()
         encrypted_body: str = cipher.encrypt(self.body.encode()).decode()
@@ -153,6 +323,83 @@ class Post(db.Model):
         self.body = encrypted_body
 
 
+def _decrypt_contents(cipher, title, body) -> tuple[str, str]:
+    try:
+        return cipher.decrypt(title).decode(), cipher.decrypt(body).decode()
+    except InvalidToken:
+        error = "Error: not using the same key as encryption"
+        return error, error
+
+
+_decrypt_pool = None
+_decrypt_pool_lock = threading.Lock()
+
+
+def _get_decrypt_pool():
+    global _decrypt_pool
+    with _decrypt_pool_lock:
+        if _decrypt_pool is None:
+            _decrypt_pool = ThreadPoolExecutor(
+                max_workers=app.config["DECRYPT_POOL_SIZE"],
+                thread_name_prefix="decrypt",
+            )
+        return _decrypt_pool
+
+
+def decrypt_posts(posts) -> list[tuple[str, str]]:
+    """
+    Decrypts a batch of posts and returns their (title, body) pairs
+    in the same order, without changing the Post instances.
+    Keys are derived once per author. Batches of at least
+    DECRYPT_PARALLEL_THRESHOLD posts are spread over a bounded
+    thread pool, since scrypt and Fernet release the GIL.
+    """
+    # read everything from the ORM here, worker threads only see plain values
+    authors = {}
+    items = []
+    for post in posts:
+        user = post.user
+        authors[user.id] = (user.id, user.salt, user.password)
+        items.append((user.id, post.title, post.body))
+
+    pool_size = app.config["DECRYPT_POOL_SIZE"]
+    if len(items) < app.config["DECRYPT_PARALLEL_THRESHOLD"] or pool_size < 2:
+        ciphers = {
+            user_id: Fernet(_derive_key(*author)) for user_id, author in authors.items()
+        }
+        return [
+            _decrypt_contents(ciphers[user_id], title, body)
+            for user_id, title, body in items
+        ]
+
+    pool = _get_decrypt_pool()
+    keys = pool.map(lambda author: _derive_key(*author), authors.values())
+    ciphers = {user_id: Fernet(key) for user_id, key in zip(authors, keys)}
+
+    def decrypt_chunk(chunk):
+        return [
+            _decrypt_contents(ciphers[user_id], title, body)
+            for user_id, title, body in chunk
+        ]
+
+    chunk_size = -(-len(items) // pool_size)
+    chunks = [items[i : i + chunk_size] for i in range(0, len(items), chunk_size)]
+    return [pair for chunk in pool.map(decrypt_chunk, chunks) for pair in chunk]
+
+
+def iter_decrypted_posts(posts):
+    """
+    Yields (post, title, body) for each post as soon as it is decrypted,
+    so a streamed page can send every post card without waiting for the rest.
+    """
+    ciphers = {}
+    for post in posts:
+        user = post.user
+        if user.id not in ciphers:
+            ciphers[user.id] = Fernet(derive_key(user))
+        yield post, *_decrypt_contents(ciphers[user.id], post.title, post.body)
+
+
 class User(db.Model, UserMixin):
     __tablename__ = "users"
 
@@ -176,6 +423,9 @@ class User(db.Model, UserMixin):
     # logs
     log = db.relationship("Log", uselist=False, back_populates="user")
 
+    # last change to the name shown on the user's post cards
+    updated = db.Column(db.DateTime, nullable=True)
+
     # UserMixin attributes
     active = db.Column(db.Boolean, nullable=False, default=True)
 
@@ -195,10 +445,43 @@ class User(db.Model, UserMixin):
 
     def validate_password(self, password):
         try:
-            return ph.verify(self.password, password)
+            return password_pool.verify(self.password, password)
         except exceptions.VerifyMismatchError:
             return False
 
+    def rehash_password(self, password):
+        """
+        Hashes the password again with the current argon2 parameters,
+        left for the caller to commit. Post keys are derived from the hash,
+        so the user's posts are re-encrypted with the new key. The user's
+        row is written (and locked) before the posts are read, so a post
+        saved meanwhile by another session is either re-encrypted here or
+        waits and is encrypted with the new key (see Post.commit_encrypted).
+        """
+        try:
+            password_hash = password_pool.hash(password)
+        except PasswordPoolBusy:
+            # don't make the login wait, retried next login
+            return
+        cipher = Fernet(derive_key(self))
+        old_hash = self.password
+        self.password = password_hash
+        db.session.flush()
+        posts = Post.query.filter_by(userid=self.id).populate_existing().all()
+        try:
+            contents = [
+                (post, cipher.decrypt(post.title), cipher.decrypt(post.body))
+                for post in posts
+            ]
+        except InvalidToken:
+            # keep the old hash rather than lose posts
+            self.password = old_hash
+            return
+        for post, title, body in contents:
+            post.title = title.decode()
+            post.body = body.decode()
+            post.encrypt_post(self)
+
     def validate_mfa(self, token):
         totp = pyotp.TOTP(self.mfa_key)
         return totp.verify(token)
@@ -218,37 +501,123 @@ class User(db.Model, UserMixin):
         return self.active
 
     def generate_log(self):
-        log = Log(self.id)
-        db.session.add(log)
-        db.session.commit()
-        return log
+        # saved together with the user, the caller commits
+        self.log = Log(self.id)
+        return self.log
 
     def update_log(self):
+        """
+        Records a login on the user's log without committing, so it is
+        saved in the same transaction as the rest of the login. With
+        LOGIN_WRITE_BEHIND the update is queued for the login writer instead.
+        """
         if self.log is None:  # when the user is loggin in but log not created before
             self.generate_log()
 
+        if app.config["LOGIN_WRITE_BEHIND"] and self.log.id is not None:
+            # started here by the first login of each process
+            login_listener.start()
+            try:
+                login_queue.put_nowait((self.id, datetime.now(), request.remote_addr))
+                return
+            except queue.Full:
+                pass  # write it with the login instead
+
         self.log.previous_login = self.log.latest_login  # type: ignore
         self.log.previous_ip = self.log.latest_ip  # type: ignore
 
         self.log.latest_login = datetime.now()  # type: ignore
         self.log.latest_ip = request.remote_addr  # type: ignore
 
-        db.session.commit()
+
+# drop cached post keys as soon as the key material changes
+@event.listens_for(User.password, "set")
+@event.listens_for(User.salt, "set")
+def invalidate_user_key(target, value, oldvalue, initiator):
+    if target.id is not None and value != oldvalue:
+        key_cache.invalidate_where(lambda key: key[0] == target.id)
+
+
+# reload cached users when anything in their snapshot or their password changes
+@event.listens_for(User.email, "set")
+@event.listens_for(User.role, "set")
+@event.listens_for(User.active, "set")
+@event.listens_for(User.firstname, "set")
+@event.listens_for(User.lastname, "set")
+@event.listens_for(User.password, "set")
+def invalidate_cached_user(target, value, oldvalue, initiator):
+    if target.id is not None and value != oldvalue:
+        user_cache.invalidate(target.id)
+
+
+# post cards show the author's name, and the feed's ETag covers its authors' updates
+@event.listens_for(User.firstname, "set")
+@event.listens_for(User.lastname, "set")
+def invalidate_author_cards(target, value, oldvalue, initiator):
+    if target.id is not None and value != oldvalue:
+        target.updated = datetime.now()
+        fragment_cache.invalidate_where(lambda key: key[1] == target.id)
+
+
+@event.listens_for(User, "after_delete")
+def forget_deleted_user(mapper, connection, target):
+    user_cache.invalidate(target.id)
+
+
+class UserSnapshot(NamedTuple):
+    id: int
+    email: str
+    role: str
+    active: bool
+    firstname: str
+    lastname: str
+
+
+class CurrentUser(UserMixin):
+    """
+    The logged in user as seen by flask-login, built from a cached
+    snapshot. Anything not in the snapshot (posts, password, phone...)
+    loads the full User row, once per request.
+    """
+
+    def __init__(self, snapshot: UserSnapshot):
+        self._snapshot = snapshot
+        self._user = None
+
+    @property
+    def is_active(self):
+        return self._snapshot.active
+
+    def get_id(self):
+        return str(self._snapshot.id)
+
+    def _get_user(self) -> User:
+        if self._user is None:
+            self._user = db.session.get(User, self._snapshot.id)
+        return self._user
+
+    def __getattr__(self, name):
+        # only called for attributes that aren't found the normal way
+        if name.startswith("_"):
+            raise AttributeError(name)
+        if name in UserSnapshot._fields:
+            return getattr(self._snapshot, name)
+        return getattr(self._get_user(), name)
 
 
 class Log(db.Model):
     __tablename__ = "logs"
 
     id = db.Column(db.Integer, primary_key=True)
-    userid = db.Column(db.Integer, db.ForeignKey("users.id"))
+    userid = db.Column(db.Integer, db.ForeignKey("users.id"), index=True)
 
     registered_on = db.Column(db.DateTime, nullable=False)
 
-    latest_login = db.Column(db.DateTime, nullable=True)
+    latest_login = db.Column(db.DateTime, nullable=True, index=True)
     previous_login = db.Column(db.DateTime, nullable=True)
 
     # flask request object: request.remote_addr
-    latest_ip = db.Column(db.String(100), nullable=True)
+    latest_ip = db.Column(db.String(100), nullable=True, index=True)
     previous_ip = db.Column(db.String(100), nullable=True)
 
     user = db.relationship("User", back_populates="log")
@@ -258,95 +627,201 @@ class Log(db.Model):
         self.registered_on = datetime.now()
 
 
-# database admin
-class MainIndexLink(MenuLink):
-    def get_url(self):
-        return url_for("index")
-
-
-class PostView(ModelView):
-    column_display_pk = True
-    column_hide_backrefs = False
-    column_list = ("id", "userid", "created", "title", "body", "user")
-
-    can_create = False
-    can_edit = False
-    can_delete = False
-
-    @override
-    def is_accessible(self):
-        return current_user.is_authenticated and current_user.role == "db_admin"
-
-    @override
-    def inaccessible_callback(self, name, **kwargs):  # type: ignore
-        if current_user.is_authenticated:
-            abort(403)
-        # if anonymous
-        flash("Administrator access required.", category="danger")
-        return redirect(url_for("accounts.login"))
-
-
-class UserView(ModelView):
-    column_display_pk = True  # optional, but I like to see the IDs in the list
-    column_hide_backrefs = False
-    column_list = (
-        "id",
-        "email",
-        "password",
-        "mfa_key",
-        "mfa_enabled",
-        "firstname",
-        "lastname",
-        "phone",
-        "posts",
+class SecurityEvent(db.Model):
+    __tablename__ = "security_events"
+    __table_args__ = (
+        db.Index("ix_security_events_userid_created", "userid", "created"),
+        db.Index("ix_security_events_email_created", "email", "created"),
+        db.Index("ix_security_events_ip_created", "ip", "created"),
+        db.Index("ix_security_events_created", "created"),
     )
 
-    @override
-    def is_accessible(self):
-        return current_user.is_authenticated and current_user.role == "db_admin"
+    # append-only, rows are inserted in batches by the log queue listener
+    id = db.Column(db.Integer, primary_key=True)
+    created = db.Column(db.DateTime, nullable=False)
+    event = db.Column(db.String(50), nullable=False)
+
+    userid = db.Column(db.Integer, nullable=True)
+    email = db.Column(db.String(100), nullable=True)
+    role = db.Column(db.String(100), nullable=True)
+    ip = db.Column(db.String(100), nullable=True)
+
+    postid = db.Column(db.Integer, nullable=True)
+    author = db.Column(db.String(100), nullable=True)
+    attempts = db.Column(db.Integer, nullable=True)
+    url = db.Column(db.String(2048), nullable=True)
 
-    @override
-    def inaccessible_callback(self, name, **kwargs):  # type: ignore
-        if current_user.is_authenticated:
-            abort(403)
-        # if anonymous
-        flash("Administrator access required.", category="danger")
-        return redirect(url_for("accounts.login"))
 
+class SecurityRollup(db.Model):
+    __tablename__ = "security_rollups"
 
-admin = Admin(app, name="DB Admin", template_mode="bootstrap4")
-admin._menu = admin._menu[1:]
-admin.add_link(MainIndexLink(name="Home Page"))
-admin.add_view(PostView(Post, db.session))
-admin.add_view(UserView(User, db.session))
+    # events per hour since the epoch (0 for all time), event type and
+    # address ("" for every address), added to by the log queue listener
+    period = db.Column(db.Integer, primary_key=True)
+    event = db.Column(db.String(50), primary_key=True)
+    ip = db.Column(db.String(100), primary_key=True)
+    count = db.Column(db.Integer, nullable=False)
 
 
 # app wide default rate limiter
 from flask_limiter import Limiter
 from flask_limiter.util import get_remote_address
 
+import limiter_storage  # registers the sqlite:// limiter storage
+
+# set up on the app, and its storage opened, by setup_app()
 limiter = Limiter(
     key_func=get_remote_address,
-    app=app,
     default_limits=["500 per day"],
 )
 
-# set up mfa qr code
-qrcode = QRcode(app)
-
 # set up logging
 logger = logging.getLogger(__name__)
-handler = logging.FileHandler("security.log", "a")
+# the file is opened by the first record written
+handler = logging.FileHandler(app.config["SECURITY_LOG_FILE"], "a", delay=True)
 logger.setLevel(logging.INFO)
 formatter = logging.Formatter(
     fmt="%(asctime)s - %(levelname)s - %(message)s",
     datefmt="%d/%m/%Y %I:%M:%S %p",
 )
 handler.setFormatter(formatter)
-logger.addHandler(handler)
 
-# password hasher
-ph = PasswordHasher()
+# request threads only put records on a bounded queue,
+# a background listener writes them to the file in batches
+log_queue = queue.Queue(maxsize=app.config["LOG_QUEUE_SIZE"])
+
+
+def _events_engine():
+    # called from the listener thread, which has no app context of its own
+    with app.app_context():
+        return db.engine
+
+
+# hourly dashboard counters, shared by the workers through the database
+security_rollups = SecurityRollups(
+    SecurityRollup.__table__, _events_engine, hours=app.config["ROLLUP_HOURS"]
+)
+
+# started by the first record logged in each process, so workers forked
+# from a preloaded app run their own listener
+log_listener = BatchingQueueListener(
+    log_queue,
+    handler,
+    EventStoreHandler(SecurityEvent.__table__, _events_engine),
+    security_rollups,
+    batch_size=app.config["LOG_BATCH_SIZE"],
+    flush_interval=app.config["LOG_FLUSH_INTERVAL"],
+)
+logger.addHandler(
+    BoundedQueueHandler(
+        log_queue, overflow=app.config["LOG_QUEUE_OVERFLOW"], listener=log_listener
+    )
+)
+# write out whatever is still queued when the worker exits
+atexit.register(log_listener.stop)
+
+
+class LoginLogWriter:
+    """
+    Applies queued logins, (userid, when, ip), to the logs table with one
+    transaction per batch. The rows are applied in order, so a user who
+    logs in twice within a batch still gets the right previous login.
+    """
+
+    def __init__(self, get_engine):
+        self.get_engine = get_engine
+        self.engine = None
+        logs = Log.__table__
+        self.statement = (
+            update(logs)
+            .where(logs.c.userid == bindparam("b_userid"))
+            .values(
+                previous_login=logs.c.latest_login,
+                previous_ip=logs.c.latest_ip,
+                latest_login=bindparam("b_when"),
+                latest_ip=bindparam("b_ip"),
+            )
+        )
+
+    def emit_batch(self, batch):
+        rows = [{"b_userid": u, "b_when": when, "b_ip": ip} for u, when, ip in batch]
+        try:
+            if self.engine is None:
+                self.engine = self.get_engine()
+            with self.engine.begin() as connection:
+                connection.execute(self.statement, rows)
+        except Exception:
+            logging.getLogger(__name__).exception(
+                "Failed to write %d logins", len(rows)
+            )
+
+
+# last login/IP updates queued by User.update_log when LOGIN_WRITE_BEHIND is set
+login_queue = queue.Queue(maxsize=app.config["LOG_QUEUE_SIZE"])
+login_listener = BatchingQueueListener(
+    login_queue,
+    LoginLogWriter(_events_engine),
+    batch_size=app.config["LOG_BATCH_SIZE"],
+    flush_interval=app.config["LOG_FLUSH_INTERVAL"],
+)
+atexit.register(login_listener.stop)
+
+
+def record_event(event, user=None, email=None, post=None, **fields):
+    """
+    Records a security event. It goes through the log queue as a
+    security.log line, a row of the security_events table and a count
+    in the dashboard rollups. `user` defaults to nobody, the IP
+    to the current request's address.
+    """
+    security_event = {
+        "created": datetime.now(),
+        "event": event,
+        "userid": getattr(user, "id", None),
+        "email": email or getattr(user, "email", None),
+        "role": getattr(user, "role", None),
+        "ip": request.remote_addr if has_request_context() else None,
+        "postid": getattr(post, "id", None),
+        "author": None,
+        "attempts": None,
+        "url": None,
+    }
+    security_event.update(fields)
+    if security_event["url"]:
+        # urls are client controlled, keep them within the column size
+        security_event["url"] = security_event["url"][:2048]
+
+    logger.info(format_event(security_event), extra={"security_event": security_event})
+
+
+# password hasher, `flask calibrate-argon2` suggests parameters for the host
+app.config["ARGON2_TIME_COST"] = int(os.getenv("ARGON2_TIME_COST", DEFAULT_TIME_COST))
+app.config["ARGON2_MEMORY_COST"] = int(
+    os.getenv("ARGON2_MEMORY_COST", DEFAULT_MEMORY_COST)
+)
+app.config["ARGON2_PARALLELISM"] = int(
+    os.getenv("ARGON2_PARALLELISM", DEFAULT_PARALLELISM)
+)
+ph = PasswordHasher(
+    time_cost=app.config["ARGON2_TIME_COST"],
+    memory_cost=app.config["ARGON2_MEMORY_COST"],
+    parallelism=app.config["ARGON2_PARALLELISM"],
+)
+
+# argon2 runs in a bounded pool of worker processes, calls beyond the workers
+# and the queue wait PASSWORD_POOL_TIMEOUT seconds and are then turned away (503)
+app.config["PASSWORD_POOL_WORKERS"] = int(
+    os.getenv("PASSWORD_POOL_WORKERS", min(4, os.cpu_count() or 1))
+)
+app.config["PASSWORD_POOL_QUEUE"] = int(os.getenv("PASSWORD_POOL_QUEUE", 16))
+app.config["PASSWORD_POOL_TIMEOUT"] = float(os.getenv("PASSWORD_POOL_TIMEOUT", 0.5))
+password_pool = PasswordPool(
+    ph,
+    workers=app.config["PASSWORD_POOL_WORKERS"],
+    queue_size=app.config["PASSWORD_POOL_QUEUE"],
+    admission_timeout=app.config["PASSWORD_POOL_TIMEOUT"],
+)
+atexit.register(password_pool.shutdown)
 
 # firewall conditions
 conditions = {
@@ -357,12 +832,22 @@ conditions = {
     ),
 }
 
-# import blueprints (after app because of circular import)
-from accounts.views import accounts_bp
-from posts.views import posts_bp
-from security.views import security_bp
+# rule sets can be swapped by pointing FIREWALL_RULES at a json file
+if os.getenv("FIREWALL_RULES"):
+    conditions = load_conditions(os.getenv("FIREWALL_RULES"))
 
-# register blueprints
-app.register_blueprint(accounts_bp)
-app.register_blueprint(posts_bp)
-app.register_blueprint(security_bp)
+app.config["FIREWALL_CACHE_SIZE"] = int(os.getenv("FIREWALL_CACHE_SIZE", 1024))
+firewall_matcher = Firewall(conditions, cache_size=app.config["FIREWALL_CACHE_SIZE"])
+
+# request body inspection, only the listed rule families are applied to bodies
+app.config["FIREWALL_BODY_RULES"] = [
+    label for label in os.getenv("FIREWALL_BODY_RULES", "XSS").split(",") if label
+]
+app.config["FIREWALL_BODY_MAX_BYTES"] = int(
+    os.getenv("FIREWALL_BODY_MAX_BYTES", 1024 * 1024)
+)
+app.config["FIREWALL_BODY_OVERLAP"] = int(os.getenv("FIREWALL_BODY_OVERLAP", 256))
+# larger request bodies are refused with a 413 before being read
+app.config["MAX_CONTENT_LENGTH"] = int(
+    os.getenv("MAX_CONTENT_LENGTH", 16 * 1024 * 1024)
+)
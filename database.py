@@ -0,0 +1,98 @@
+import random
+import sqlite3
+import time
+
+from flask import current_app, g, has_request_context, session
+from flask_sqlalchemy.session import Session
+from sqlalchemy import Select, event
+from sqlalchemy.engine import make_url
+
+
+def engine_options(uri, config):
+    """
+    Returns the SQLAlchemy engine options for the database uri:
+    pool sizing and recycling, except for in-memory sqlite databases
+    which share a single connection.
+    """
+    options = {"pool_pre_ping": config["DB_POOL_PRE_PING"]}
+    url = make_url(uri) if uri else None
+    if url is not None and url.get_backend_name() == "sqlite":
+        if url.database in (None, "", ":memory:"):
+            return options
+    options.update(
+        pool_size=config["DB_POOL_SIZE"],
+        max_overflow=config["DB_MAX_OVERFLOW"],
+        pool_recycle=config["DB_POOL_RECYCLE"],
+    )
+    return options
+
+
+def sqlite_pragmas(config):
+    """
+    Returns a "connect" event listener that sets the journal mode,
+    synchronous level, memory-mapped I/O size, page cache size and
+    busy timeout on new sqlite connections. Other databases are left alone.
+    """
+    pragmas = (
+        f"PRAGMA journal_mode={config['SQLITE_JOURNAL_MODE']}",
+        f"PRAGMA synchronous={config['SQLITE_SYNCHRONOUS']}",
+        f"PRAGMA mmap_size={int(config['SQLITE_MMAP_SIZE'])}",
+        f"PRAGMA cache_size={int(config['SQLITE_CACHE_SIZE'])}",
+        f"PRAGMA busy_timeout={int(config['SQLITE_BUSY_TIMEOUT'])}",
+    )
+
+    def set_pragmas(dbapi_connection, connection_record):
+        if not isinstance(dbapi_connection, sqlite3.Connection):
+            return
+        cursor = dbapi_connection.cursor()
+        try:
+            for pragma in pragmas:
+                cursor.execute(pragma)
+        finally:
+            cursor.close()
+
+    return set_pragmas
+
+
+def reads_from_replica():
+    """
+    True inside a read-only view, unless this request has written or
+    the client wrote within the last REPLICA_READ_AFTER_WRITE seconds,
+    so clients always see their own changes.
+    """
+    if not has_request_context() or not g.get("read_only") or g.get("wrote"):
+        return False
+    last_write = session.get("last_write")
+    window = current_app.config["REPLICA_READ_AFTER_WRITE"]
+    return last_write is None or time.time() - last_write > window
+
+
+class RoutingSession(Session):
+    """
+    Session that sends the SELECTs of read-only views to a read replica
+    (one of the REPLICA_BIND_KEYS binds) picked at random once per
+    request, so every read of a page, e.g. its ETag and its rows, sees
+    the same replica lag. Flushes and everything else use the primary.
+    """
+
+    def get_bind(self, mapper=None, clause=None, bind=None, **kwargs):
+        replicas = current_app.config["REPLICA_BIND_KEYS"]
+        if (
+            bind is None
+            and replicas
+            and not self._flushing
+            and isinstance(clause, Select)
+            and reads_from_replica()
+        ):
+            if "replica" not in g:
+                g.replica = random.choice(replicas)
+            return self._db.engines[g.replica]
+        return super().get_bind(mapper=mapper, clause=clause, bind=bind, **kwargs)
+
+
+@event.listens_for(RoutingSession, "after_flush")
+def remember_write(session_, flush_context):
+    # keeps the rest of the request and the client's next reads on the primary
+    if has_request_context():
+        g.wrote = True
+        session["last_write"] = time.time()
@@ -1,6 +1,6 @@
 from functools import wraps
 
-from flask import abort, flash
+from flask import abort, flash, g
 from flask_login import current_user
 
 from utils import redirect_based_on_role
@@ -32,3 +32,16 @@ def anonymous_required(f):
         return f(*args, **kwargs)
 
     return wrapped
+
+
+def read_only(f):
+    """
+    Lets the view's queries go to a read replica, when one is configured.
+    """
+
+    @wraps(f)
+    def wrapped(*args, **kwargs):
+        g.read_only = True
+        return f(*args, **kwargs)
+
+    return wrapped
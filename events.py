@@ -0,0 +1,87 @@
+import logging
+
+from sqlalchemy import insert
+
+# security event types
+LOGIN = "Successful Login"
+LOGIN_FAILED = "Invalid Login Attempt"
+LOGIN_LOCKED = "Exceeded Login Attempts"
+LOGOUT = "Successful Log Out"
+REGISTRATION = "Successful Registration"
+POST_CREATED = "Post Created"
+POST_UPDATED = "Post Updated"
+POST_DELETED = "Post Deleted"
+UPDATE_DENIED = "Unauthorized Update"
+DELETE_DENIED = "Unauthorized Deletion"
+RATE_LIMIT = "Rate Limit"
+FORBIDDEN = "Forbidden Access"
+FIREWALL_BLOCK = "Attack Detected"
+
+EVENT_TYPES = (
+    LOGIN,
+    LOGIN_FAILED,
+    LOGIN_LOCKED,
+    LOGOUT,
+    REGISTRATION,
+    POST_CREATED,
+    POST_UPDATED,
+    POST_DELETED,
+    UPDATE_DENIED,
+    DELETE_DENIED,
+    RATE_LIMIT,
+    FORBIDDEN,
+    FIREWALL_BLOCK,
+)
+
+# order and labels of the fields in a security.log line
+LOG_LINE_FIELDS = (
+    ("User", "email"),
+    ("Role", "role"),
+    ("Attempts", "attempts"),
+    ("URL Requested", "url"),
+    ("Post", "postid"),
+    ("Author", "author"),
+    ("IP", "ip"),
+)
+
+
+def format_event(event):
+    """
+    Formats an event as a security.log message,
+    e.g. "[User: a@b.com, Role: end_user, IP: 127.0.0.1] Successful Login."
+    """
+    fields = ", ".join(
+        f"{label}: {event[key]}"
+        for label, key in LOG_LINE_FIELDS
+        if event.get(key) is not None
+    )
+    return f"[{fields}] {event['event']}."
+
+
+class EventStoreHandler(logging.Handler):
+    """
+    Log handler that appends the structured event attached to a record
+    (record.security_event) to the security events table. Meant to run
+    behind the log queue, where whole batches are inserted at once.
+    """
+
+    def __init__(self, table, get_engine):
+        super().__init__()
+        self.table = table
+        self.get_engine = get_engine
+        self.engine = None
+
+    def emit(self, record):
+        self.emit_batch([record])
+
+    def emit_batch(self, batch):
+        rows = [r.security_event for r in batch if hasattr(r, "security_event")]
+        if not rows:
+            return
+        try:
+            if self.engine is None:
+                self.engine = self.get_engine()
+            with self.engine.begin() as connection:
+                connection.execute(insert(self.table), rows)
+        except Exception:
+            self.handleError(batch[-1])
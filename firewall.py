@@ -0,0 +1,306 @@
+import codecs
+import io
+import json
+import re
+import threading
+import time
+from werkzeug.wsgi import get_input_stream
+
+from cache import TTLCache
+
+try:
+    # private modules, only used to build the optional prefilter
+    from re import _constants as sre
+    from re import _parser as sre_parse
+except ImportError:
+    sre = sre_parse = None
+
+# inline flags that can be scoped to a single group
+SCOPED_FLAGS = {re.IGNORECASE: "i", re.MULTILINE: "m", re.DOTALL: "s", re.VERBOSE: "x"}
+
+# longer requests are matched every time instead of filling the verdict cache
+MAX_CACHED_REQUEST_LENGTH = 2048
+
+MISSING = object()
+
+FORM_MIMETYPES = ("application/x-www-form-urlencoded", "multipart/form-data")
+
+
+def load_conditions(path):
+    """
+    Loads firewall conditions from a JSON file mapping each
+    rule family label to a regex. Rules are case-insensitive.
+    Raises ValueError for rules with backreferences.
+    """
+    with open(path) as f:
+        rules = json.load(f)
+    for label, pattern in rules.items():
+        check_rule(label, pattern)
+    return {
+        label: re.compile(pattern, re.IGNORECASE) for label, pattern in rules.items()
+    }
+
+
+def check_rule(label, pattern):
+    """
+    Raises ValueError when the rule refers to a group by number or name.
+    All rule families share one combined pattern, so their groups are
+    renumbered and backreferences would point at the wrong group.
+    """
+    index, in_class = 0, False
+    while index < len(pattern):
+        char = pattern[index]
+        if char == "\\":
+            following = pattern[index + 1 : index + 2]
+            if not in_class and following.isdigit() and following != "0":
+                break
+            index += 2
+            continue
+        if in_class:
+            in_class = char != "]"
+        elif char == "[":
+            in_class = True
+            # a ] right after [ or [^ is a literal
+            index += pattern.startswith("^", index + 1)
+            index += pattern.startswith("]", index + 1)
+        elif pattern.startswith(("(?P=", "(?("), index):
+            break
+        index += 1
+    else:
+        return
+    raise ValueError(
+        f"firewall rule {label!r} uses a backreference, which is not supported"
+    )
+
+
+def _first_chars(items):
+    """
+    Returns the characters a match of the parsed pattern can start with,
+    or None when the pattern can start with anything we can't enumerate.
+    """
+    if not items:
+        return None
+    op, av = items[0]
+    if op is sre.LITERAL:
+        return {chr(av)}
+    if op is sre.IN:
+        chars = set()
+        for in_op, in_av in av:
+            if in_op is sre.LITERAL:
+                chars.add(chr(in_av))
+            elif in_op is sre.RANGE and in_av[1] - in_av[0] < 256:
+                chars.update(map(chr, range(in_av[0], in_av[1] + 1)))
+            else:
+                return None
+        return chars
+    if op is sre.BRANCH:
+        chars = set()
+        for branch in av[1]:
+            branch_chars = _first_chars(list(branch))
+            if branch_chars is None:
+                return None
+            chars |= branch_chars
+        return chars
+    if op is sre.SUBPATTERN:
+        return _first_chars(list(av[-1]))
+    if op in (sre.MAX_REPEAT, sre.MIN_REPEAT) and av[0] > 0:
+        return _first_chars(list(av[2]))
+    return None
+
+
+class Firewall:
+    """
+    Matches a request against every rule family in one regex pass over
+    the path and one over the query string.
+    Each family becomes a named group of one combined pattern, so the
+    label of the matching family comes straight from the match.
+    Verdicts for recently seen requests are kept in an LRU cache.
+    """
+
+    def __init__(self, conditions, cache_size=1024):
+        self.verdicts = TTLCache(maxsize=cache_size)
+        # rule family label -> [scans, seconds] for request body inspection
+        self.body_timings = {}
+        self._timings_lock = threading.Lock()
+        self.load(conditions)
+
+    def load(self, conditions):
+        for label, pattern in conditions.items():
+            check_rule(label, getattr(pattern, "pattern", pattern))
+        # verdicts from the previous rules no longer apply
+        self.verdicts.clear()
+        self.conditions = {
+            label: re.compile(pattern) for label, pattern in conditions.items()
+        }
+        self.labels = {}
+        groups = []
+        for index, (label, pattern) in enumerate(self.conditions.items()):
+            name = f"rule{index}"
+            self.labels[name] = label
+            groups.append(f"(?P<{name}>{self._scoped(pattern)})")
+        self.matcher = (
+            re.compile(self._prefilter() + "(?:" + "|".join(groups) + ")")
+            if groups
+            else None
+        )
+
+    @staticmethod
+    def _scoped(pattern):
+        flags = "".join(c for flag, c in SCOPED_FLAGS.items() if pattern.flags & flag)
+        return f"(?{flags}:{pattern.pattern})" if flags else pattern.pattern
+
+    def _prefilter(self):
+        # a lookahead on the characters any rule can start with lets the
+        # engine skip most positions without trying every alternative
+        if sre_parse is None:
+            return ""
+        chars = set()
+        for pattern in self.conditions.values():
+            pattern_chars = _first_chars(
+                list(sre_parse.parse(pattern.pattern, pattern.flags))
+            )
+            if pattern_chars is None:
+                return ""
+            chars |= pattern_chars
+        ignore_case = any(p.flags & re.IGNORECASE for p in self.conditions.values())
+        char_class = "[" + "".join(re.escape(c) for c in sorted(chars)) + "]"
+        return f"(?=(?i:{char_class}))" if ignore_case else f"(?={char_class})"
+
+    def match(self, path, query_string=""):
+        """
+        Returns the label of the leftmost rule family found in the path,
+        then in the query string, or None when the request is clean.
+        The two are searched separately, so ^ and $ anchor to the start
+        and end of each, as they did when every rule was tried in turn.
+        """
+        if self.matcher is None:
+            return None
+        match = self.matcher.search(path) or self.matcher.search(query_string)
+        return self.labels[match.lastgroup] if match else None
+
+    def check(self, path, query_string: bytes):
+        """
+        Same as match(), but takes the raw query string and answers
+        repeated requests from the verdict cache without any regex work.
+        """
+        if len(path) + len(query_string) > MAX_CACHED_REQUEST_LENGTH:
+            return self.match(path, query_string.decode())
+
+        key = (path, query_string)
+        label = self.verdicts.get(key, MISSING)
+        if label is MISSING:
+            label = self.match(path, query_string.decode())
+            self.verdicts.set(key, label)
+        return label
+
+    def flush(self):
+        self.verdicts.clear()
+
+    def scan_chunks(self, chunks, labels, overlap=256):
+        """
+        Scans text chunks against the given rule families and returns
+        the first label found. The last `overlap` characters are carried
+        into the next chunk so a match across a chunk boundary is still
+        found, while only one chunk is held in memory at a time.
+        """
+        patterns = [
+            (label, self.conditions[label])
+            for label in labels
+            if label in self.conditions
+        ]
+        tail = ""
+        for chunk in chunks:
+            window = tail + chunk
+            for label, pattern in patterns:
+                start = time.perf_counter()
+                found = pattern.search(window)
+                elapsed = time.perf_counter() - start
+                with self._timings_lock:
+                    timing = self.body_timings.setdefault(label, [0, 0.0])
+                    timing[0] += 1
+                    timing[1] += elapsed
+                if found:
+                    return label
+            tail = window[-overlap:] if overlap else ""
+        return None
+
+    def body_stats(self):
+        """
+        Returns the number of body scans and the mean scan time in
+        microseconds of each rule family.
+        """
+        with self._timings_lock:
+            return {
+                label: {"scans": scans, "mean_us": seconds / scans * 1e6}
+                for label, (scans, seconds) in self.body_timings.items()
+            }
+
+
+class ReplayStream(io.RawIOBase):
+    """
+    Serves the `head` bytes already read from a stream, then the rest
+    of the stream, so a body can be peeked at without copying all of it.
+    """
+
+    def __init__(self, head, stream):
+        self.head = io.BytesIO(head)
+        self.stream = stream
+
+    def readable(self):
+        return True
+
+    def readinto(self, buffer):
+        size = self.head.readinto(buffer)
+        if size:
+            return size
+        data = self.stream.read(len(buffer))
+        buffer[: len(data)] = data
+        return len(data)
+
+
+def request_body_chunks(request, max_bytes, chunk_size=65536):
+    """
+    Yields the request body as text chunks, stopping after `max_bytes`.
+    Form fields and uploads are read from the parsed form. Only the
+    scanned part of a raw body is read, it is kept in memory and
+    replayed ahead of the unread rest, so the view can still read
+    the whole body afterwards.
+    """
+    remaining = max_bytes
+
+    if request.mimetype in FORM_MIMETYPES:
+        for value in request.form.values():
+            for start in range(0, min(len(value), remaining), chunk_size):
+                yield value[start : min(start + chunk_size, remaining)]
+            remaining -= len(value.encode())
+            # keep matches from running across two fields
+            yield "\n"
+            if remaining <= 0:
+                return
+        for upload in request.files.values():
+            decoder = codecs.getincrementaldecoder("utf-8")("replace")
+            while remaining > 0:
+                chunk = upload.stream.read(min(chunk_size, remaining))
+                if not chunk:
+                    break
+                remaining -= len(chunk)
+                yield decoder.decode(chunk)
+            upload.stream.seek(0)
+            yield "\n"
+        return
+
+    # the request stream has not been touched yet, read the wsgi input directly
+    environ = request.environ
+    stream = get_input_stream(environ, max_content_length=request.max_content_length)
+    head = bytearray()
+    decoder = codecs.getincrementaldecoder("utf-8")("replace")
+    try:
+        while len(head) < max_bytes:
+            chunk = stream.read(min(chunk_size, max_bytes - len(head)))
+            if not chunk:
+                break
+            head += chunk
+            yield decoder.decode(chunk)
+    finally:
+        # the view reads what was scanned from memory and the rest from the client
+        environ["wsgi.input"] = ReplayStream(bytes(head), stream)
@@ -0,0 +1,151 @@
+import os
+import sqlite3
+import threading
+import time
+from math import floor
+
+from limits.storage import Storage
+from limits.storage.base import SlidingWindowCounterSupport, TimestampedSlidingWindow
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS counters (
+    key TEXT PRIMARY KEY,
+    count INTEGER NOT NULL,
+    expiry REAL NOT NULL
+)
+"""
+
+# adds to a live counter, or restarts it when it has expired
+INCR = """
+INSERT INTO counters (key, count, expiry) VALUES (:key, :amount, :expiry)
+ON CONFLICT (key) DO UPDATE SET
+    count = CASE WHEN counters.expiry <= :now
+        THEN excluded.count ELSE counters.count + excluded.count END,
+    expiry = CASE WHEN counters.expiry <= :now
+        THEN excluded.expiry ELSE counters.expiry END
+RETURNING count
+"""
+
+
+class SQLiteStorage(Storage, SlidingWindowCounterSupport, TimestampedSlidingWindow):
+    """
+    Rate limit storage in a local SQLite file, shared by every worker
+    process on the host, e.g. ``sqlite:///ratelimit.db`` (relative)
+    or ``sqlite:////var/run/blog/ratelimit.db`` (absolute).
+    Expired counters are swept every `sweep_interval` seconds.
+    """
+
+    STORAGE_SCHEME = ["sqlite"]
+
+    def __init__(self, uri, wrap_exceptions=False, sweep_interval=60, **options):
+        super().__init__(uri, wrap_exceptions=wrap_exceptions, **options)
+        self.path = uri.split("://", 1)[1][1:] or ":memory:"
+        self.sweep_interval = float(sweep_interval)
+        self._last_sweep = time.time()
+        self._local = threading.local()
+
+    @property
+    def base_exceptions(self):
+        return sqlite3.Error
+
+    @property
+    def connection(self):
+        # one connection per thread, opened again after a fork
+        if getattr(self._local, "pid", None) != os.getpid():
+            connection = sqlite3.connect(self.path, timeout=5, isolation_level=None)
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute("PRAGMA synchronous=NORMAL")
+            connection.execute(SCHEMA)
+            self._local.connection = connection
+            self._local.pid = os.getpid()
+        return self._local.connection
+
+    def _incr(self, connection, key, expiry, amount, now):
+        return connection.execute(
+            INCR, {"key": key, "amount": amount, "expiry": now + expiry, "now": now}
+        ).fetchone()[0]
+
+    def _get(self, connection, key, now):
+        row = connection.execute(
+            "SELECT count FROM counters WHERE key = ? AND expiry > ?", (key, now)
+        ).fetchone()
+        return row[0] if row else 0
+
+    def _sweep(self, now):
+        if now - self._last_sweep >= self.sweep_interval:
+            self._last_sweep = now
+            self.connection.execute("DELETE FROM counters WHERE expiry <= ?", (now,))
+
+    def incr(self, key, expiry, amount=1):
+        now = time.time()
+        self._sweep(now)
+        return self._incr(self.connection, key, expiry, amount, now)
+
+    def get(self, key):
+        return self._get(self.connection, key, time.time())
+
+    def get_expiry(self, key):
+        now = time.time()
+        row = self.connection.execute(
+            "SELECT expiry FROM counters WHERE key = ? AND expiry > ?", (key, now)
+        ).fetchone()
+        return row[0] if row else now
+
+    def check(self):
+        try:
+            self.connection.execute("SELECT 1")
+            return True
+        except sqlite3.Error:
+            return False
+
+    def reset(self):
+        return self.connection.execute("DELETE FROM counters").rowcount
+
+    def clear(self, key):
+        self.connection.execute("DELETE FROM counters WHERE key = ?", (key,))
+
+    def acquire_sliding_window_entry(self, key, limit, expiry, amount=1):
+        if amount > limit:
+            return False
+        now = time.time()
+        self._sweep(now)
+        previous_key, current_key = self.sliding_window_keys(key, expiry, now)
+        connection = self.connection
+        # the write lock makes check-and-increment atomic across processes
+        connection.execute("BEGIN IMMEDIATE")
+        try:
+            previous_count, previous_ttl, current_count, _ = self._sliding_window(
+                connection, previous_key, current_key, expiry, now
+            )
+            weighted_count = previous_count * previous_ttl / expiry + current_count
+            if floor(weighted_count) + amount > limit:
+                connection.execute("COMMIT")
+                return False
+            self._incr(connection, current_key, 2 * expiry, amount, now)
+            connection.execute("COMMIT")
+            return True
+        except BaseException:
+            connection.execute("ROLLBACK")
+            raise
+
+    def get_sliding_window(self, key, expiry):
+        now = time.time()
+        previous_key, current_key = self.sliding_window_keys(key, expiry, now)
+        return self._sliding_window(
+            self.connection, previous_key, current_key, expiry, now
+        )
+
+    def _sliding_window(self, connection, previous_key, current_key, expiry, now):
+        previous_count = self._get(connection, previous_key, now)
+        current_count = self._get(connection, current_key, now)
+        if previous_count == 0:
+            previous_ttl = 0.0
+        else:
+            previous_ttl = (1 - (((now - expiry) / expiry) % 1)) * expiry
+        current_ttl = (1 - ((now / expiry) % 1)) * expiry + expiry
+        return previous_count, previous_ttl, current_count, current_ttl
+
+    def clear_sliding_window(self, key, expiry):
+        previous_key, current_key = self.sliding_window_keys(key, expiry, time.time())
+        self.clear(previous_key)
+        self.clear(current_key)
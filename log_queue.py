@@ -0,0 +1,138 @@
+import logging
+import os
+import queue
+import threading
+from logging.handlers import QueueHandler
+
+# put on the queue to tell the listener to stop once everything before it is written
+STOP = object()
+
+
+class BoundedQueueHandler(QueueHandler):
+    """
+    Queue handler for a bounded queue. When the queue is full the record
+    is dropped ("drop"), replaces the oldest queued record ("drop_oldest"),
+    or waits up to `timeout` seconds for space ("block"). The `listener`
+    emptying the queue is started by the first record of each process.
+    """
+
+    def __init__(self, queue, overflow="drop", timeout=0.1, listener=None):
+        super().__init__(queue)
+        self.overflow = overflow
+        self.timeout = timeout
+        self.listener = listener
+        self.dropped = 0
+
+    def enqueue(self, record):
+        if self.listener is not None:
+            self.listener.start()
+        try:
+            if self.overflow == "block":
+                self.queue.put(record, timeout=self.timeout)
+            else:
+                self.queue.put_nowait(record)
+            return
+        except queue.Full:
+            pass
+
+        if self.overflow == "drop_oldest":
+            try:
+                self.queue.get_nowait()
+                self.queue.put_nowait(record)
+            except (queue.Empty, queue.Full):
+                pass
+        self.dropped += 1
+
+
+class BatchingQueueListener:
+    """
+    Background thread that takes records off the queue and hands them
+    to the handlers in batches of up to `batch_size`. Stream handlers
+    get the whole batch written with a single flush.
+    The thread is started on first use and again after a fork, threads
+    don't survive forking.
+    """
+
+    def __init__(self, queue, *handlers, batch_size=100, flush_interval=0.5):
+        self.queue = queue
+        self.handlers = handlers
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self._thread = None
+        self._pid = None
+        self._lock = threading.Lock()
+
+    def start(self):
+        # called for every record, so the usual case is a single pid check
+        if self._pid == os.getpid():
+            return
+        with self._lock:
+            if self._pid == os.getpid():
+                return
+            if self._pid is not None:
+                # forked: the records and locks copied from the parent belong
+                # to the parent's listener, start over with an empty queue
+                self.queue.__init__(self.queue.maxsize)
+            self._thread = threading.Thread(
+                target=self._run, name="log-queue-listener", daemon=True
+            )
+            self._thread.start()
+            self._pid = os.getpid()
+
+    def stop(self, timeout=5):
+        """
+        Writes every record queued so far and stops the listener thread.
+        """
+        if self._thread is not None and self._pid == os.getpid():
+            self.queue.put(STOP)
+            self._thread.join(timeout)
+            self._thread = None
+            self._pid = None
+
+    def _run(self):
+        stopping = False
+        while not stopping:
+            try:
+                record = self.queue.get(timeout=self.flush_interval)
+            except queue.Empty:
+                continue
+            if record is STOP:
+                break
+
+            batch = [record]
+            while len(batch) < self.batch_size:
+                try:
+                    record = self.queue.get_nowait()
+                except queue.Empty:
+                    break
+                if record is STOP:
+                    stopping = True
+                    break
+                batch.append(record)
+            self.handle_batch(batch)
+
+    def handle_batch(self, batch):
+        for handler in self.handlers:
+            if hasattr(handler, "emit_batch"):
+                handler.emit_batch(batch)
+            elif isinstance(handler, logging.StreamHandler):
+                self._write_stream(handler, batch)
+            else:
+                for record in batch:
+                    handler.handle(record)
+
+    @staticmethod
+    def _write_stream(handler, batch):
+        records = [r for r in batch if r.levelno >= handler.level and handler.filter(r)]
+        if not records:
+            return
+        with handler.lock:
+            try:
+                if handler.stream is None:
+                    # file handlers made with delay=True open the file on first use
+                    handler.stream = handler._open()
+                for record in records:
+                    handler.stream.write(handler.format(record) + handler.terminator)
+                handler.flush()
+            except Exception:
+                handler.handleError(records[-1])
@@ -0,0 +1,69 @@
+from flask import Blueprint, current_app, render_template, request
+from flask_login import current_user
+
+import events
+from config import firewall_matcher, record_event
+from firewall import request_body_chunks
+
+main_bp = Blueprint("main", __name__, template_folder="templates")
+
+
+@main_bp.route("/")
+def index():
+    return render_template("home/index.html")
+
+
+@main_bp.app_errorhandler(429)
+def rate_limit(e):
+    record_event(events.RATE_LIMIT, user=current_user, url=request.url)
+    return render_template("errors/rate_limit.html"), 429
+
+
+@main_bp.app_errorhandler(403)
+def forbidden(e):
+    record_event(events.FORBIDDEN, user=current_user, url=request.url)
+    return render_template("errors/forbidden.html"), 403
+
+
+# bad request
+@main_bp.app_errorhandler(400)
+def bad_request(e):
+    return render_template("errors/bad_request.html"), 400
+
+
+# not found
+@main_bp.app_errorhandler(404)
+def page_not_found(e):
+    return render_template("errors/not_found.html"), 404
+
+
+# internal server error
+@main_bp.app_errorhandler(500)
+def internal_server_error(e):
+    return render_template("errors/internal_server_error.html"), 500
+
+
+# not implemented
+@main_bp.app_errorhandler(501)
+def not_implemented(e):
+    return render_template("errors/not_implemented.html"), 501
+
+
+# service unavailable, e.g. the password hashing pool is full
+@main_bp.app_errorhandler(503)
+def service_unavailable(e):
+    return render_template("errors/service_unavailable.html"), 503, {"Retry-After": "1"}
+
+
+@main_bp.before_app_request
+def firewall():
+    label = firewall_matcher.check(request.path, request.query_string)
+    if not label and request.method in ("POST", "PUT", "PATCH"):
+        label = firewall_matcher.scan_chunks(
+            request_body_chunks(request, current_app.config["FIREWALL_BODY_MAX_BYTES"]),
+            labels=current_app.config["FIREWALL_BODY_RULES"],
+            overlap=current_app.config["FIREWALL_BODY_OVERLAP"],
+        )
+    if label:
+        record_event(events.FIREWALL_BLOCK, user=current_user, url=request.url)
+        return render_template("errors/attack_detected.html", label=label)
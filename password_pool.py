@@ -0,0 +1,157 @@
+import multiprocessing
+import os
+import threading
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+from werkzeug.exceptions import ServiceUnavailable
+
+# hasher of the current worker process, set up by _init_worker
+_hasher = None
+
+
+class PasswordPoolBusy(ServiceUnavailable):
+    description = "Too many sign-ins are being processed. Please try again shortly."
+
+
+def _init_worker(hasher):
+    global _hasher
+    _hasher = hasher
+
+
+def _run(method, *args):
+    start = time.perf_counter()
+    result = getattr(_hasher, method)(*args)
+    return result, time.perf_counter() - start
+
+
+class PasswordPool:
+    """
+    Runs Argon2 hashing and verification in a bounded pool of worker
+    processes, so password checks don't hold up the request workers.
+    At most `workers + queue_size` calls are admitted at once, callers
+    past that wait up to `admission_timeout` seconds and then get a
+    PasswordPoolBusy (503). A call that finds the pool broken by a dead
+    worker also gets a 503, and a new pool is started for the next call.
+    With workers=0 calls run in the caller.
+    """
+
+    def __init__(
+        self,
+        hasher,
+        workers=1,
+        queue_size=16,
+        admission_timeout=0,
+        start_method="spawn",
+        samples=512,
+    ):
+        self.hasher = hasher
+        self.workers = workers
+        self.queue_size = queue_size
+        self.admission_timeout = admission_timeout
+        self.start_method = start_method
+        self.in_flight = 0
+        self.completed = 0
+        self.rejected = 0
+        self.broken = 0
+        # latencies of the most recent calls, (total seconds, hashing seconds)
+        self.latencies = deque(maxlen=samples)
+        self._slots = threading.BoundedSemaphore(workers + queue_size)
+        self._lock = threading.Lock()
+        self._executor = None
+        self._pid = None
+
+    @property
+    def executor(self):
+        # started on first use and again after a fork, pools don't survive forking
+        with self._lock:
+            if self._pid != os.getpid():
+                self._executor = ProcessPoolExecutor(
+                    max_workers=self.workers,
+                    mp_context=multiprocessing.get_context(self.start_method),
+                    initializer=_init_worker,
+                    initargs=(self.hasher,),
+                )
+                self._pid = os.getpid()
+            return self._executor
+
+    def _call(self, method, *args):
+        if not self.workers:
+            return getattr(self.hasher, method)(*args)
+        timeout = self.admission_timeout or None
+        if not self._slots.acquire(blocking=timeout is not None, timeout=timeout):
+            with self._lock:
+                self.rejected += 1
+            raise PasswordPoolBusy()
+        start = time.perf_counter()
+        with self._lock:
+            self.in_flight += 1
+        try:
+            executor = self.executor
+            result, hashing = executor.submit(_run, method, *args).result()
+        except BrokenProcessPool:
+            # a worker died (e.g. killed for its memory), the executor can't
+            # be used again, so the next call starts a new pool
+            self._discard(executor)
+            raise PasswordPoolBusy()
+        finally:
+            with self._lock:
+                self.in_flight -= 1
+            self._slots.release()
+        with self._lock:
+            self.completed += 1
+            self.latencies.append((time.perf_counter() - start, hashing))
+        return result
+
+    def _discard(self, executor):
+        with self._lock:
+            self.broken += 1
+            if self._executor is executor:
+                self._executor = None
+                self._pid = None
+        executor.shutdown(wait=False, cancel_futures=True)
+
+    def hash(self, password):
+        return self._call("hash", password)
+
+    def verify(self, hash, password):
+        """
+        Same as PasswordHasher.verify, raises VerifyMismatchError on a wrong password.
+        """
+        return self._call("verify", hash, password)
+
+    def metrics(self):
+        """
+        Returns the queue depth, counters and latency percentiles in milliseconds.
+        """
+        with self._lock:
+            totals = sorted(total for total, _ in self.latencies)
+            hashing = sorted(hashing for _, hashing in self.latencies)
+            in_flight = self.in_flight
+            completed = self.completed
+            rejected = self.rejected
+            broken = self.broken
+
+        def percentile(values, fraction):
+            if not values:
+                return None
+            return values[min(len(values) - 1, int(len(values) * fraction))] * 1000
+
+        return {
+            "workers": self.workers,
+            "queue_size": self.queue_size,
+            "in_flight": in_flight,
+            "queued": max(0, in_flight - self.workers),
+            "completed": completed,
+            "rejected": rejected,
+            "broken": broken,
+            "latency_p50_ms": percentile(totals, 0.5),
+            "latency_p95_ms": percentile(totals, 0.95),
+            "hash_p50_ms": percentile(hashing, 0.5),
+        }
+
+    def shutdown(self):
+        if self._executor is not None and self._pid == os.getpid():
+            self._executor.shutdown(cancel_futures=True)
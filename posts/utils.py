@@ -0,0 +1,63 @@
+from flask import render_template
+from markupsafe import Markup
+
+from config import decrypt_posts, fragment_cache, fragment_cipher, iter_decrypted_posts
+
+
+def _card_key(post, viewer_id):
+    # the author's update time is part of the key so a rename made in another
+    # process still misses this process's cached cards
+    return (
+        post.id,
+        post.userid,
+        post.created,
+        str(post.userid) == str(viewer_id),
+        post.user.updated,
+    )
+
+
+def _cached_card(key):
+    token = fragment_cache.get(key)
+    if token is None:
+        return None
+    return Markup(fragment_cipher.decrypt(token).decode())
+
+
+def _render_card(key, post, title, body):
+    card = render_template(
+        "posts/post_card.html", post=post, title=title, body=body, is_author=key[3]
+    )
+    fragment_cache.set(key, fragment_cipher.encrypt(card.encode()))
+    return Markup(card)
+
+
+def post_cards(posts, viewer_id):
+    """
+    Returns the rendered card of each post, in order. Cards found in the
+    fragment cache skip key derivation, decryption and rendering, the rest
+    are decrypted in one batch and cached.
+    """
+    keys = [_card_key(post, viewer_id) for post in posts]
+    cards = [_cached_card(key) for key in keys]
+    misses = [i for i, card in enumerate(cards) if card is None]
+    contents = decrypt_posts([posts[i] for i in misses])
+    for i, (title, body) in zip(misses, contents):
+        cards[i] = _render_card(keys[i], posts[i], title, body)
+    return cards
+
+
+def iter_post_cards(posts, viewer_id):
+    """
+    Yields the rendered card of each post as soon as it is ready,
+    for streamed pages.
+    """
+    keys = [_card_key(post, viewer_id) for post in posts]
+    cards = [_cached_card(key) for key in keys]
+    misses = iter_decrypted_posts(
+        post for post, card in zip(posts, cards) if card is None
+    )
+    for key, card in zip(keys, cards):
+        if card is None:
+            post, title, body = next(misses)
+            card = _render_card(key, post, title, body)
+        yield card
@@ -3,13 +3,27 @@ import base64
 from hashlib import scrypt
 
 from cryptography.fernet import Fernet
-from flask import Blueprint, flash, redirect, render_template, request, url_for
+from flask import (
+    Blueprint,
+    current_app,
+    flash,
+    get_flashed_messages,
+    make_response,
+    redirect,
+    render_template,
+    request,
+    stream_template,
+    url_for,
+)
 from flask_login import current_user, login_required
-from sqlalchemy import desc
+from sqlalchemy.orm import joinedload
 
-from config import Post, db, logger
-from decorators import roles_required
+import events
+from config import Post, User, db, fragment_cache, record_event
+from decorators import read_only, roles_required
 from posts.forms import PostForm
+from posts.utils import iter_post_cards, post_cards
+from utils import keyset_paginate, not_modified, page_validators, with_validators
 
 posts_bp = Blueprint("posts", __name__, template_folder="templates")
 
@@ -17,14 +31,61 @@ posts_bp = Blueprint("posts", __name__, template_folder="templates")
 @posts_bp.route("/posts")
 @login_required
 @roles_required("end_user")
+@read_only
 def posts():
-    all_posts: list[Post] = Post.query.order_by(desc("id")).all()
+    # answer reloads of an unchanged feed before querying and decrypting the page
+    # the authors' names are on the page too
+    etag, last_modified = page_validators(
+        Post.query.outerjoin(Post.user), Post.id, Post.created, User.updated
+    )
+    unchanged = not_modified(etag, last_modified)
+    if unchanged:
+        return unchanged
+
+    page_posts, newer, older = keyset_paginate(
+        # authors are joined in so decrypting and rendering do not lazy load them
+        Post.query.options(joinedload(Post.user)),
+        Post.id,
+        per_page=current_app.config["POSTS_PER_PAGE"],
+        before=request.args.get("before", type=int),
+        after=request.args.get("after", type=int),
+    )
 
-    # decrypt posts contents
-    for post in all_posts:
-        post.title, post.body = post.decrypt_post()
+    # taken out of the session before a streamed response saves it
+    messages = get_flashed_messages(with_categories=True)
+
+    if current_app.config["STREAM_FEEDS"]:
+        # page header goes out first, then each post card as it is decrypted
+        return with_validators(
+            make_response(
+                stream_template(
+                    "posts/posts.html",
+                    messages=messages,
+                    cards=iter_post_cards(page_posts, current_user.get_id()),
+                    newer=newer,
+                    older=older,
+                )
+            ),
+            etag,
+            last_modified,
+        )
 
-    return render_template("posts/posts.html", posts=all_posts)
+    # decrypt and render only the posts on this page that aren't cached
+    cards = post_cards(page_posts, current_user.get_id())
+
+    return with_validators(
+        make_response(
+            render_template(
+                "posts/posts.html",
+                messages=messages,
+                cards=cards,
+                newer=newer,
+                older=older,
+            )
+        ),
+        etag,
+        last_modified,
+    )
 
 
 @posts_bp.route("/create", methods=["GET", "POST"])
@@ -37,13 +98,8 @@ def create():
         new_post = Post(
             userid=current_user.get_id(), title=form.title.data, body=form.body.data
         )
-        new_post.encrypt_post(current_user)
-
-        db.session.add(new_post)
-        db.session.commit()
-        logger.info(
-            f"[User: {current_user.email}, Role: {current_user.role}, Post: {new_post.id}, IP: {request.remote_addr}] Post Created."
-        )
+        new_post.commit_encrypted(current_user)
+        record_event(events.POST_CREATED, user=current_user, post=new_post)
 
         flash("Post created.", category="success")
         return redirect(url_for("posts.posts"))
@@ -60,8 +116,11 @@ def update(id):
         flash("Post not found.", category="danger")
         return redirect(url_for("posts.posts"))
     if post_to_update and current_user.get_id() != str(post_to_update.userid):
-        logger.info(
-            f"[User: {current_user.email}, Role: {current_user.role}, Post: {post_to_update.id}, Author: {post_to_update.user.email}, IP: {request.remote_addr}] Unauthorized Update."
+        record_event(
+            events.UPDATE_DENIED,
+            user=current_user,
+            post=post_to_update,
+            author=post_to_update.user.email,
         )
         flash("You do not have permission to update this post.", category="danger")
         return redirect(url_for("posts.posts"))
@@ -73,8 +132,11 @@ def update(id):
         post_to_update.update(title=form.title.data, body=form.body.data)
 
         flash("Post updated.", category="success")
-        logger.info(
-            f"[User: {current_user.email}, Role: {current_user.role}, Post: {post_to_update.id}, Author: {post_to_update.user.email}, IP: {request.remote_addr}] Post updated."
+        record_event(
+            events.POST_UPDATED,
+            user=current_user,
+            post=post_to_update,
+            author=post_to_update.user.email,
         )
         return redirect(url_for("posts.posts"))
 
@@ -93,8 +155,8 @@ def delete(id):
         flash("Post not found.", category="danger")
         return redirect(url_for("posts.posts"))
     if post and current_user.get_id() != str(post.userid):
-        logger.info(
-            f"[User: {current_user.email}, Role: {current_user.role}, Post: {post.id}, Author: {post.user.email}, IP: {request.remote_addr}] Unauthorized Deletion."
+        record_event(
+            events.DELETE_DENIED, user=current_user, post=post, author=post.user.email
         )
         flash("You do not have permission to delete this post.", category="danger")
         return redirect(url_for("posts.posts"))
@@ -102,9 +164,10 @@ def delete(id):
     authors_email = post.user.email
     Post.query.filter_by(id=id).delete()
     db.session.commit()
+    fragment_cache.invalidate_where(lambda key: key[0] == id)
 
-    logger.info(
-        f"[User: {current_user.email}, Role: {current_user.role}, Post: {id}, Author: {authors_email}, IP: {request.remote_addr}] Post deleted."
+    record_event(
+        events.POST_DELETED, user=current_user, postid=id, author=authors_email
     )
     flash("Post deleted.", category="success")
     return redirect(url_for("posts.posts"))
@@ -0,0 +1,150 @@
+import logging
+import time
+from collections import Counter
+from datetime import datetime
+
+from sqlalchemy import and_, delete, desc, func, insert, or_, select, update
+from sqlalchemy.exc import IntegrityError
+
+import events
+
+# event types shown on the dashboard rollups
+TRACKED_EVENTS = (
+    events.LOGIN,
+    events.LOGIN_FAILED,
+    events.RATE_LIMIT,
+    events.FIREWALL_BLOCK,
+)
+
+# event types counted against the IP address that caused them
+SUSPICIOUS_EVENTS = (
+    events.LOGIN_FAILED,
+    events.LOGIN_LOCKED,
+    events.RATE_LIMIT,
+    events.FORBIDDEN,
+    events.FIREWALL_BLOCK,
+)
+
+# period of the rows holding the all time totals, others are hours since the epoch
+ALL_TIME = 0
+# ip of the rows counting events from every address
+ALL_IPS = ""
+
+
+class SecurityRollups:
+    """
+    Hourly security event counts kept in the security rollups table, so
+    every worker adds to and reads the same numbers and they survive
+    restarts. The log queue listener hands over each batch of events,
+    which is added with one transaction, so the dashboard never scans
+    event history. Hours older than `hours` are deleted as they expire.
+    """
+
+    def __init__(self, table, get_engine, hours=24):
+        self.table = table
+        self.get_engine = get_engine
+        self.engine = None
+        self.hours = hours
+
+    def counts(self, batch):
+        """
+        Returns the (period, event, ip) -> count increments for a batch
+        of log records carrying a security event.
+        """
+        counts = Counter()
+        for record in batch:
+            event = getattr(record, "security_event", None)
+            if event is None:
+                continue
+            period = int(event["created"].timestamp() // 3600)
+            if event["event"] in TRACKED_EVENTS:
+                counts[ALL_TIME, event["event"], ALL_IPS] += 1
+                counts[period, event["event"], ALL_IPS] += 1
+            if event["ip"] and event["event"] in SUSPICIOUS_EVENTS:
+                counts[period, event["event"], event["ip"]] += 1
+        return counts
+
+    def emit_batch(self, batch):
+        counts = self.counts(batch)
+        if not counts:
+            return
+        try:
+            if self.engine is None:
+                self.engine = self.get_engine()
+            try:
+                self._add(counts)
+            except IntegrityError:
+                # another worker inserted one of the rows first, add to it instead
+                self._add(counts)
+        except Exception:
+            logging.getLogger(__name__).exception(
+                "Failed to add %d security events to the rollups", len(batch)
+            )
+
+    def _add(self, counts):
+        table = self.table
+        expired = int(time.time() // 3600) - self.hours
+        with self.engine.begin() as connection:
+            for (period, event, ip), amount in counts.items():
+                row = and_(
+                    table.c.period == period, table.c.event == event, table.c.ip == ip
+                )
+                result = connection.execute(
+                    update(table).where(row).values(count=table.c.count + amount)
+                )
+                if not result.rowcount:
+                    connection.execute(
+                        insert(table).values(
+                            period=period, event=event, ip=ip, count=amount
+                        )
+                    )
+            connection.execute(
+                delete(table).where(
+                    table.c.period != ALL_TIME, table.c.period <= expired
+                )
+            )
+
+    def snapshot(self, top_ips=10):
+        """
+        Returns the all time totals, the last `hours` hourly buckets per
+        tracked event type and the IPs with the most suspicious events.
+        """
+        table = self.table
+        current = int(time.time() // 3600)
+        first = current - self.hours + 1
+        if self.engine is None:
+            self.engine = self.get_engine()
+        with self.engine.connect() as connection:
+            rows = connection.execute(
+                select(table.c.period, table.c.event, table.c.count).where(
+                    table.c.ip == ALL_IPS,
+                    or_(table.c.period == ALL_TIME, table.c.period >= first),
+                )
+            ).all()
+            total = func.sum(table.c.count).label("total")
+            top = connection.execute(
+                select(table.c.ip, total)
+                .where(table.c.ip != ALL_IPS, table.c.period >= first)
+                .group_by(table.c.ip)
+                .order_by(desc(total))
+                .limit(top_ips)
+            ).all()
+
+        totals = dict.fromkeys(TRACKED_EVENTS, 0)
+        hourly = {event: [0] * self.hours for event in TRACKED_EVENTS}
+        for period, event, count in rows:
+            if event not in totals:
+                continue
+            if period == ALL_TIME:
+                totals[event] = count
+            elif period <= current:
+                hourly[event][period - first] = count
+        return {
+            "totals": totals,
+            "hours": [
+                datetime.fromtimestamp(period * 3600)
+                for period in range(first, current + 1)
+            ],
+            "hourly": hourly,
+            "top_ips": [(ip, count) for ip, count in top],
+        }
@@ -0,0 +1,143 @@
+import os
+import sys
+from datetime import datetime, timedelta
+
+from sqlalchemy.orm import contains_eager
+
+from config import Log, SecurityEvent, User
+
+# sortable columns of the login table
+LOGIN_TABLE_SORTS = {
+    "account": User.id,
+    "email": User.email,
+    "role": User.role,
+    "registered": Log.registered_on,
+    "latest_login": Log.latest_login,
+    "latest_ip": Log.latest_ip,
+}
+
+
+def read_lines_backwards(path, before=None, block_size=8192):
+    """
+    Yields (offset, line) pairs from the end of the file towards the
+    start, reading fixed size blocks backwards from EOF (or from byte
+    offset `before`). The offset is where the line starts in the file.
+    """
+    with open(path, "rb") as f:
+        end = f.seek(0, os.SEEK_END)
+        position = end if before is None else min(before, end)
+        remainder = b""
+        while position > 0:
+            read_size = min(block_size, position)
+            position -= read_size
+            f.seek(position)
+            block = f.read(read_size) + remainder
+            lines = block.split(b"\n")
+            # the first piece may continue in the previous block
+            remainder = lines.pop(0)
+            line_end = position + len(block)
+            for line in reversed(lines):
+                line_start = line_end - len(line)
+                if line:
+                    yield line_start, line.decode(errors="replace")
+                line_end = line_start - 1
+        if remainder:
+            yield 0, remainder.decode(errors="replace")
+
+
+def tail(path, n, before=None, predicate=None, max_scan_bytes=16 * 1024 * 1024):
+    """
+    Returns the last n lines of the file (oldest first) that end before
+    byte offset `before` and satisfy the predicate, plus the offset to
+    pass as `before` to load the lines above them (None at the start
+    of the file). At most `max_scan_bytes` are read per call.
+    """
+    lines = []
+    start, scan_from = None, before
+    for offset, line in read_lines_backwards(path, before=before):
+        if scan_from is None:
+            scan_from = offset
+        elif scan_from - offset > max_scan_bytes:
+            # stop here, the caller can carry on from the last scanned line
+            return lines[::-1], start
+        start = offset
+        if predicate is None or predicate(line):
+            lines.append(line)
+            if len(lines) == n:
+                return lines[::-1], start or None
+    return lines[::-1], None
+
+
+def log_line_filter(user=None, ip=None, event=None):
+    """
+    Returns a predicate matching security log lines for the given user
+    email, IP address and event text, or None when nothing is filtered.
+    """
+    if not (user or ip or event):
+        return None
+
+    def predicate(line):
+        if user and f"User: {user}," not in line:
+            return False
+        if ip and f"IP: {ip}]" not in line and f"IP: {ip}," not in line:
+            return False
+        if event and event.lower() not in line.rsplit("]", 1)[-1].lower():
+            return False
+        return True
+
+    return predicate
+
+
+def find_events(email=None, ip=None, event=None, hours=None, limit=50):
+    """
+    Returns the latest security events matching the filters (newest first)
+    and how many events match in total. Filtering by email or IP reads an
+    indexed (column, created) range instead of scanning the table.
+    """
+    query = SecurityEvent.query
+    if email:
+        query = query.filter(SecurityEvent.email == email)
+    if ip:
+        query = query.filter(SecurityEvent.ip == ip)
+    if event:
+        query = query.filter(SecurityEvent.event == event)
+    if hours:
+        query = query.filter(
+            SecurityEvent.created >= datetime.now() - timedelta(hours=hours)
+        )
+
+    events = query.order_by(SecurityEvent.created.desc()).limit(limit).all()
+    # only count filtered queries, counting the whole table is a full scan
+    total = query.count() if email or ip or event or hours else None
+    return events, total
+
+
+def prefix_filter(column, prefix):
+    """
+    Returns `column >= prefix AND column < upper bound`, a prefix match
+    written as a range so it can seek the column's index, unlike LIKE.
+    """
+    condition = column >= prefix
+    last = ord(prefix[-1])
+    if last < sys.maxunicode:
+        condition &= column < prefix[:-1] + chr(last + 1)
+    return condition
+
+
+def login_table(
+    page=1, per_page=20, sort="latest_login", descending=True, email="", ip=""
+):
+    """
+    Returns one page of the login table with each log's user joined in.
+    `email` and `ip` are case-sensitive prefixes, matched as ranges so
+    they can use the indexes on users.email and logs.latest_ip.
+    """
+    query = Log.query.join(Log.user).options(contains_eager(Log.user))
+    if email:
+        query = query.filter(prefix_filter(User.email, email))
+    if ip:
+        query = query.filter(prefix_filter(Log.latest_ip, ip))
+
+    column = LOGIN_TABLE_SORTS.get(sort, Log.latest_login)
+    query = query.order_by(column.desc() if descending else column.asc(), Log.id)
+    return query.paginate(page=page, per_page=per_page, error_out=False)
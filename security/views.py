@@ -1,8 +1,10 @@
-from flask import Blueprint, render_template
+from flask import Blueprint, current_app, render_template, request
 from flask_login import login_required
 
-from config import Log, logger
-from decorators import roles_required
+from config import logger, password_pool, security_rollups
+from decorators import read_only, roles_required
+from events import EVENT_TYPES
+from security.utils import find_events, log_line_filter, login_table, tail
 
 security_bp = Blueprint("security", __name__, template_folder="templates")
 
@@ -10,18 +12,58 @@ security_bp = Blueprint("security", __name__, template_folder="templates")
 @security_bp.route("/security")
 @login_required
 @roles_required("sec_admin")
+@read_only
 def security():
-    all_logs = Log.query.all()
+    login_filters = {
+        "sort": request.args.get("sort", "latest_login"),
+        "order": request.args.get("order", "desc"),
+        "login_email": request.args.get("login_email", "").strip(),
+        "login_ip": request.args.get("login_ip", "").strip(),
+    }
+    logins = login_table(
+        page=request.args.get("page", 1, type=int),
+        per_page=current_app.config["LOGS_PER_PAGE"],
+        sort=login_filters["sort"],
+        descending=login_filters["order"] != "asc",
+        email=login_filters["login_email"],
+        ip=login_filters["login_ip"],
+    )
+
+    filters = {
+        "user": request.args.get("user", "").strip(),
+        "ip": request.args.get("ip", "").strip(),
+        "event": request.args.get("event", "").strip(),
+    }
+    hours = request.args.get("hours", type=int)
     try:
-        with open("security.log") as f:
-            print(f)
-            general_logs = f.readlines()
-            general_logs = general_logs[-10:]
-            print(general_logs)
+        general_logs, before = tail(
+            current_app.config["SECURITY_LOG_FILE"],
+            current_app.config["SECURITY_LOG_LINES"],
+            before=request.args.get("before", type=int),
+            predicate=log_line_filter(**filters),
+        )
     except FileNotFoundError:
         logger.error("Log file not found!")
-        general_logs = []
+        general_logs, before = [], None
+
+    events, events_total = find_events(
+        email=filters["user"],
+        ip=filters["ip"],
+        event=filters["event"],
+        hours=hours,
+    )
 
     return render_template(
-        "security/security.html", logs=all_logs, general_logs=general_logs
+        "security/security.html",
+        logins=logins,
+        login_filters=login_filters,
+        general_logs=general_logs,
+        before=before,
+        filters=filters,
+        hours=hours,
+        events=events,
+        events_total=events_total,
+        event_types=EVENT_TYPES,
+        rollups=security_rollups.snapshot(),
+        password_pool=password_pool.metrics(),
     )
@@ -0,0 +1,29 @@
+import os
+import time
+
+from jinja2 import FileSystemBytecodeCache
+
+
+def bytecode_cache(directory=None):
+    """
+    Returns a Jinja bytecode cache in `directory`, shared by every worker
+    using the same directory. Without a directory Jinja picks a private
+    one in the system temp folder.
+    """
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    return FileSystemBytecodeCache(directory or None)
+
+
+def warm_templates(app):
+    """
+    Compiles every template of the app (or loads it from the bytecode
+    cache) into the Jinja environment, so first requests don't pay for it.
+    Returns the load time of each template in milliseconds.
+    """
+    timings = {}
+    for name in app.jinja_loader.list_templates():
+        start = time.perf_counter()
+        app.jinja_env.get_template(name)
+        timings[name] = (time.perf_counter() - start) * 1000
+    return timings
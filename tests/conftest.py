@@ -0,0 +1,65 @@
+import os
+import tempfile
+
+# the app reads its settings on import, point it at throwaway files
+directory = tempfile.mkdtemp()
+os.environ["SQLALCHEMY_DATABASE_URI"] = f"sqlite:///{directory}/app.db"
+os.environ["RATELIMIT_STORAGE_URI"] = f"sqlite:///{directory}/ratelimit.db"
+os.environ["SECURITY_LOG_FILE"] = os.path.join(directory, "security.log")
+os.environ["PASSWORD_POOL_WORKERS"] = "0"
+os.environ.setdefault("SECRET_KEY", "test")
+
+import pytest
+
+from app import app
+from config import (
+    Post,
+    User,
+    db,
+    fragment_cache,
+    key_cache,
+    limiter,
+    ph,
+    user_cache,
+)
+
+
+@pytest.fixture
+def client():
+    app.config["TESTING"] = True
+    with app.app_context():
+        db.drop_all()
+        db.create_all()
+    for cache in (fragment_cache, key_cache, user_cache):
+        cache.clear()
+    # rate limits and failed login counts
+    limiter.reset()
+    return app.test_client()
+
+
+def add_posts(authors, posts):
+    """
+    Adds `authors` users sharing `posts` posts and returns the first user's id.
+    """
+    with app.app_context():
+        password = ph.hash("Passw0rd!")
+        users = [
+            User(f"author{i}@example.com", "Jo", "Bloggs", "020-12345678", password)
+            for i in range(authors)
+        ]
+        db.session.add_all(users)
+        db.session.commit()
+        for i in range(posts):
+            user = users[i % authors]
+            post = Post(user.id, f"title {i}", f"body {i}")
+            post.user = user
+            post.encrypt_post(user)
+            db.session.add(post)
+        db.session.commit()
+        return users[0].id
+
+
+def log_in(client, user_id):
+    with client.session_transaction() as session:
+        session["_user_id"] = str(user_id)
+        session["_fresh"] = True
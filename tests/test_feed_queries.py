@@ -0,0 +1,35 @@
+import pytest
+from sqlalchemy import event
+
+from app import app
+from conftest import add_posts, log_in
+from config import db
+
+# queries per page whatever the number of posts and authors: the logged in
+# user, the page validators and the posts with their authors joined in
+FEED_QUERIES = 3
+
+
+def count_queries(client, url):
+    queries = []
+    with app.app_context():
+        engine = db.engine
+
+    def count(conn, cursor, statement, *args):
+        queries.append(statement)
+
+    event.listen(engine, "before_cursor_execute", count)
+    try:
+        response = client.get(url, base_url="https://localhost")
+    finally:
+        event.remove(engine, "before_cursor_execute", count)
+    assert response.status_code == 200
+    return len(queries)
+
+
+@pytest.mark.parametrize("url", ["/posts", "/account"])
+@pytest.mark.parametrize("authors,posts", [(1, 1), (3, 12), (5, 20)])
+def test_feed_query_count_does_not_grow(client, url, authors, posts):
+    log_in(client, add_posts(authors, posts))
+
+    assert count_queries(client, url) == FEED_QUERIES
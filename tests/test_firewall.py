@@ -0,0 +1,77 @@
+import json
+import re
+
+import pytest
+
+from config import conditions
+from firewall import Firewall, load_conditions
+
+CUSTOM_RULES = {
+    "Admin": re.compile(r"^/admin", re.IGNORECASE),
+    "Trailing x": re.compile(r"x$", re.IGNORECASE),
+    "Query start": re.compile(r"^debug=", re.IGNORECASE),
+    "Dotfiles": re.compile(r"/\.(git|env)\b", re.IGNORECASE),
+}
+
+REQUESTS = [
+    ("/", ""),
+    ("/posts", "before=120"),
+    ("/static/css/bootstrap.min.css", "v=5.2.2"),
+    ("/posts", "id=1 UNION SELECT password FROM users"),
+    ("/posts", "q=%3Cscript%3Ealert(1)"),
+    ("/../etc/passwd", ""),
+    ("/x", "q=1"),
+    ("/posts", "q=x"),
+    ("/admin/user/", ""),
+    ("/posts/admin", ""),
+    ("/posts", "debug=1"),
+    ("/posts", "a=1&debug=1"),
+    ("/.git/config", ""),
+    ("/posts", "q=" + "abcdefgh" * 512),
+]
+
+
+def legacy_match(rules, path, query_string):
+    # the original before_request loop
+    for label, pattern in rules.items():
+        if pattern.search(path) or pattern.search(query_string):
+            return label
+    return None
+
+
+@pytest.mark.parametrize(
+    "rules", [conditions, CUSTOM_RULES, {**conditions, **CUSTOM_RULES}]
+)
+@pytest.mark.parametrize("path,query_string", REQUESTS)
+def test_detects_what_the_rule_loop_detects(rules, path, query_string):
+    expected = legacy_match(rules, path, query_string)
+    label = Firewall(rules).match(path, query_string)
+
+    assert (label is None) == (expected is None)
+    if label is not None:
+        # the matched family's own rule matches too
+        assert legacy_match({label: rules[label]}, path, query_string) == label
+
+
+def test_rules_with_backreferences_are_rejected(tmp_path):
+    rules = tmp_path / "rules.json"
+    rules.write_text(json.dumps({"Repeat": r"(a)\1", "Class": r"[\1]"}))
+
+    with pytest.raises(ValueError, match="'Repeat' uses a backreference"):
+        load_conditions(rules)
+    with pytest.raises(ValueError, match="backreference"):
+        Firewall({"Named": r"(?P<x>a)(?P=x)"})
+
+
+def test_escaped_backslash_is_not_a_backreference():
+    assert Firewall({"Backslash": r"\\1"}).match("/\\1") == "Backslash"
+
+
+def test_matches_without_the_prefilter(monkeypatch):
+    # the prefilter relies on private re modules, rules still work without it
+    monkeypatch.setattr("firewall.sre_parse", None)
+    firewall = Firewall(conditions)
+
+    assert not firewall.matcher.pattern.startswith("(?=")
+    assert firewall.match("/posts", "q=%3Cscript%3E") == "XSS"
+    assert firewall.match("/posts", "before=120") is None
@@ -0,0 +1,88 @@
+import re
+
+import pyotp
+import pytest
+from sqlalchemy import event
+
+from accounts.attempts import login_attempts
+from app import app
+from conftest import add_posts
+from config import User, db, password_pool
+
+EMAIL = "author0@example.com"
+PASSWORD = "Passw0rd!"
+
+
+@pytest.fixture
+def mfa_key(client):
+    add_posts(authors=1, posts=0)
+    with app.app_context():
+        return User.query.filter_by(email=EMAIL).one().mfa_key
+
+
+def log_in(client, password, mfa_key, ip="10.0.0.1"):
+    page = client.get("/login", base_url="https://localhost")
+    token = re.search(rb'name="csrf_token" type="hidden" value="([^"]+)"', page.data)
+    return client.post(
+        "/login",
+        data={
+            "email": EMAIL,
+            "password": password,
+            "mfa_key": pyotp.TOTP(mfa_key).now(),
+            "csrf_token": token.group(1).decode(),
+        },
+        base_url="https://localhost",
+        environ_base={"REMOTE_ADDR": ip},
+    )
+
+
+def test_account_locks_after_the_limit(client, mfa_key):
+    limit = login_attempts.account_limit.amount
+    for attempt in range(1, limit):
+        response = log_in(client, "wrong", mfa_key)
+        assert f"You have {limit - attempt} attempts left".encode() in response.data
+
+    response = log_in(client, "wrong", mfa_key)
+    assert b"try again later" in response.data
+    assert login_attempts.is_locked(EMAIL, "10.0.0.1")
+    # the account stays locked from another address, even with the right password
+    response = log_in(client, PASSWORD, mfa_key, ip="10.0.0.2")
+    assert response.status_code == 200
+    assert b"try again later" in response.data
+
+
+def test_locked_login_is_rejected_before_lookup_and_hashing(
+    client, mfa_key, monkeypatch
+):
+    for _ in range(login_attempts.account_limit.amount):
+        log_in(client, "wrong", mfa_key)
+
+    def verify(*args):
+        raise AssertionError("password checked for a locked account")
+
+    monkeypatch.setattr(password_pool, "verify", verify)
+    statements = []
+    with app.app_context():
+        engine = db.engine
+
+    def record(conn, cursor, statement, *args):
+        statements.append(statement)
+
+    event.listen(engine, "before_cursor_execute", record)
+    try:
+        response = log_in(client, PASSWORD, mfa_key)
+    finally:
+        event.remove(engine, "before_cursor_execute", record)
+
+    assert b"try again later" in response.data
+    assert not [s for s in statements if "FROM users" in s]
+
+
+def test_successful_login_clears_the_account_count(client, mfa_key):
+    log_in(client, "wrong", mfa_key)
+    log_in(client, "wrong", mfa_key)
+    assert login_attempts.failures(EMAIL) == 2
+
+    response = log_in(client, PASSWORD, mfa_key)
+    assert response.status_code == 302
+    assert login_attempts.failures(EMAIL) == 0
@@ -0,0 +1,26 @@
+from datetime import datetime
+
+from sqlalchemy import update
+
+from app import app
+from conftest import add_posts, log_in
+from config import User, db
+
+
+def test_card_shows_rename_made_by_another_process(client):
+    user_id = add_posts(1, 2)
+    log_in(client, user_id)
+    assert b"Jo Bloggs" in client.get("/posts", base_url="https://localhost").data
+
+    # a core update skips the ORM listener that clears this process's cards,
+    # as a rename handled by another worker would
+    with app.app_context():
+        db.session.execute(
+            update(User)
+            .where(User.id == user_id)
+            .values(firstname="Ann", updated=datetime.now())
+        )
+        db.session.commit()
+
+    page = client.get("/posts", base_url="https://localhost").data
+    assert page.count(b"Ann Bloggs") == 2
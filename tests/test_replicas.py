@@ -0,0 +1,38 @@
+import itertools
+
+from flask import g
+from sqlalchemy import create_engine, select
+
+import database
+from app import app
+from config import Post, User, db
+
+REPLICAS = ["replica0", "replica1"]
+
+
+def test_one_replica_serves_every_read_of_a_request(client, monkeypatch):
+    monkeypatch.setitem(app.config, "REPLICA_BIND_KEYS", REPLICAS)
+    # a different replica on every pick, unless the pick is kept for the request
+    picks = itertools.cycle(REPLICAS)
+    monkeypatch.setattr(database.random, "choice", lambda replicas: next(picks))
+
+    with app.app_context():
+        engines = {key: create_engine("sqlite://") for key in REPLICAS}
+        for key, engine in engines.items():
+            monkeypatch.setitem(db.engines, key, engine)
+
+    def read_binds():
+        with app.test_request_context():
+            g.read_only = True
+            binds = {
+                db.session.get_bind(clause=select(column))
+                for column in (Post.id, User.id, Post.created)
+            }
+            db.session.remove()
+        return binds
+
+    first = read_binds()
+    assert len(first) == 1
+    assert first <= set(engines.values())
+    # the next request can pick another replica
+    assert read_binds() != first
@@ -0,0 +1,53 @@
+import logging
+from datetime import datetime, timedelta
+
+import events
+from app import app
+from config import SecurityRollup, db
+from rollups import SecurityRollups
+
+
+def engine():
+    with app.app_context():
+        return db.engine
+
+
+def record(event, ip="1.2.3.4", created=None):
+    record = logging.makeLogRecord({"msg": event})
+    record.security_event = {
+        "event": event,
+        "ip": ip,
+        "created": created or datetime.now(),
+    }
+    return record
+
+
+def test_workers_share_the_rollups(client):
+    worker, other_worker = (
+        SecurityRollups(SecurityRollup.__table__, engine, hours=24) for _ in range(2)
+    )
+    worker.emit_batch([record(events.LOGIN_FAILED), record(events.LOGIN)])
+    other_worker.emit_batch(
+        [record(events.LOGIN_FAILED), record(events.FIREWALL_BLOCK, ip="5.6.7.8")]
+    )
+
+    # a third process, e.g. a restarted worker, reads the same counts
+    snapshot = SecurityRollups(SecurityRollup.__table__, engine).snapshot()
+    assert snapshot["totals"][events.LOGIN_FAILED] == 2
+    assert snapshot["totals"][events.LOGIN] == 1
+    assert snapshot["hourly"][events.LOGIN_FAILED][-1] == 2
+    assert snapshot["top_ips"] == [("1.2.3.4", 2), ("5.6.7.8", 1)]
+    assert len(snapshot["hours"]) == 24
+
+
+def test_expired_hours_are_dropped(client):
+    rollups = SecurityRollups(SecurityRollup.__table__, engine, hours=2)
+    rollups.emit_batch(
+        [record(events.LOGIN_FAILED, created=datetime.now() - timedelta(hours=3))]
+    )
+    rollups.emit_batch([record(events.LOGIN)])
+
+    snapshot = rollups.snapshot()
+    assert snapshot["totals"][events.LOGIN_FAILED] == 1
+    assert sum(snapshot["hourly"][events.LOGIN_FAILED]) == 0
+    assert snapshot["top_ips"] == []
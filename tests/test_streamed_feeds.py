@@ -0,0 +1,33 @@
+import pytest
+
+from app import app
+from conftest import add_posts, log_in
+
+
+@pytest.fixture
+def streamed(client):
+    app.config["STREAM_FEEDS"] = True
+    yield client
+    app.config["STREAM_FEEDS"] = False
+
+
+@pytest.mark.parametrize("url", ["/posts", "/account"])
+def test_streamed_page_consumes_flashed_messages(streamed, url):
+    log_in(streamed, add_posts(authors=2, posts=4))
+    with streamed.session_transaction() as session:
+        session["_flashes"] = [("success", "Post created.")]
+
+    first = streamed.get(url, base_url="https://localhost")
+    assert b"Post created." in first.data
+    assert b"title 0" in first.data
+
+    second = streamed.get(url, base_url="https://localhost")
+    assert b"Post created." not in second.data
+
+    # with the message gone the unchanged page can be revalidated
+    third = streamed.get(
+        url,
+        base_url="https://localhost",
+        headers={"If-None-Match": second.headers["ETag"]},
+    )
+    assert third.status_code == 304
@@ -1,5 +1,9 @@
-from flask import redirect, url_for
+from datetime import timezone
+from hashlib import blake2b
+
+from flask import current_app, redirect, request, session, url_for
 from flask_login import current_user
+from sqlalchemy import func
 
 
 def redirect_based_on_role():
@@ -12,3 +16,104 @@ def redirect_based_on_role():
         return redirect(url_for("security.security"))
     else:
         return redirect(url_for("posts.posts"))
+
+
+def keyset_paginate(query, column, per_page, before=None, after=None):
+    """
+    Returns one page of the query ordered newest first by `column`,
+    together with the cursors of the newer and older pages.
+    `before` selects the page of rows older than that cursor and
+    `after` the page of rows newer than it. A cursor is None when
+    there is no page in that direction.
+    """
+    if after is not None:
+        rows = (
+            query.filter(column > after)
+            .order_by(column.asc())
+            .limit(per_page + 1)
+            .all()
+        )
+        # went past the newest page - show the first page instead
+        if len(rows) <= per_page:
+            return keyset_paginate(query, column, per_page)
+        rows = rows[:per_page][::-1]
+        has_newer, has_older = True, True
+    else:
+        if before is not None:
+            query = query.filter(column < before)
+        rows = query.order_by(column.desc()).limit(per_page + 1).all()
+        has_newer, has_older = before is not None, len(rows) > per_page
+        rows = rows[:per_page]
+
+    if not rows:
+        return rows, None, None
+    newer_cursor = getattr(rows[0], column.key) if has_newer else None
+    older_cursor = getattr(rows[-1], column.key) if has_older else None
+    return rows, newer_cursor, older_cursor
+
+
+def page_validators(query, id_column, created_column, updated_column=None):
+    """
+    Returns the ETag and Last-Modified date of a page listing the query's
+    rows, from one aggregate query (newest id, newest created date and row
+    count) plus the viewer and the page's url. Editing a post moves its
+    created date, so edits, new posts and deletions all change the ETag.
+    `updated_column` adds the newest change to rows joined into the query,
+    such as the posts' authors.
+    """
+    columns = [func.max(id_column), func.max(created_column), func.count(id_column)]
+    if updated_column is not None:
+        columns.append(func.max(updated_column))
+    newest_id, last_modified, total, *updated = query.with_entities(*columns).one()
+    if updated and updated[0] is not None:
+        last_modified = max(filter(None, (last_modified, updated[0])))
+    viewer = (
+        current_user.get_id(),
+        current_user.email,
+        current_user.role,
+        current_user.firstname,
+        current_user.lastname,
+    )
+    etag = blake2b(
+        repr(
+            (newest_id, last_modified, total, updated, viewer, request.full_path)
+        ).encode(),
+        digest_size=16,
+    ).hexdigest()
+    if last_modified is not None:
+        # created dates are local time, http dates are utc to the second
+        last_modified = last_modified.astimezone(timezone.utc).replace(microsecond=0)
+    return etag, last_modified
+
+
+def not_modified(etag, last_modified):
+    """
+    Returns a 304 response when the client's copy of the page is still
+    current, otherwise None. If-None-Match wins over If-Modified-Since,
+    which can't tell deletions apart. Pages with pending flashed messages
+    are always sent again.
+    """
+    if "_flashes" in session:
+        return None
+    if request.if_none_match:
+        fresh = request.if_none_match.contains_weak(etag)
+    elif request.if_modified_since and last_modified:
+        fresh = request.if_modified_since >= last_modified
+    else:
+        fresh = False
+    if not fresh:
+        return None
+    return with_validators(current_app.response_class(status=304), etag, last_modified)
+
+
+def with_validators(response, etag, last_modified):
+    """
+    Sets the page's validators on the response. Browsers must check
+    back before reusing it, and shared caches must not store it.
+    """
+    response.set_etag(etag, weak=True)
+    if last_modified:
+        response.last_modified = last_modified
+    response.cache_control.private = True
+    response.cache_control.no_cache = True
+    return response